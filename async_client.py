@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# Same policy as http_cache.create_session: Retry(total=3, backoff_factor=1, status_forcelist=[...])
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_AFTER_STATUSES = (413, 429, 503)
+MAX_BACKOFF = 120
+
+
+class AsyncFetchError(Exception):
+    def __init__(self, url, message, status=None):
+        super().__init__(f"{message} for url: {url}")
+        self.url = url
+        self.status = status
+
+
+def backoff_time(backoff_factor, retry_number):
+    """Sleep before the given retry (1-based), matching urllib3: 0, then factor * 2 ** (n - 1)."""
+    if retry_number <= 1:
+        return 0
+    return min(MAX_BACKOFF, backoff_factor * (2 ** (retry_number - 1)))
+
+
+def _retry_after(headers):
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncSefariaClient:
+    """
+    asyncio HTTP client for the Sefaria API: one pooled keep-alive connector shared by all requests,
+    a per-host concurrency limit, the create_session retry policy (429/5xx with backoff, honoring
+    Retry-After) and, optionally, the same on-disk HTTPCache the requests sessions use.
+    Use as "async with AsyncSefariaClient() as client: await client.get_json(url)".
+    """
+    def __init__(self, limit=100, limit_per_host=8, total_retries=3, backoff_factor=1, timeout=10, cache=None):
+        if aiohttp is None:
+            raise RuntimeError("The async backend requires aiohttp (pip install aiohttp)")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.total_retries = total_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.cache = cache
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"accept": "application/json"},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    async def get_bytes(self, url):
+        # Cache reads and writes are blocking disk I/O, so they run in worker threads off the event loop
+        meta = await asyncio.to_thread(self.cache.lookup, url) if self.cache else None
+        if meta and self.cache.is_fresh(meta):
+            try:
+                return await asyncio.to_thread(self._read_cached, url)
+            except OSError:
+                meta = None  # Evicted since the lookup: fetch it as a miss
+        headers = self.cache.conditional_headers(meta) if meta else {}
+
+        retry_number = 0
+        while True:
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status == 304 and meta:
+                        try:
+                            return await asyncio.to_thread(self._refresh_cached, url, meta, response.headers)
+                        except OSError as e:
+                            # Another worker evicted the entry during the round trip: fetch the body again unconditionally
+                            logger.warning(f"Cached entry for {url} disappeared during revalidation ({e}); fetching it again")
+                            meta, headers = None, {}
+                            continue
+                    if response.status in RETRY_STATUSES and retry_number < self.total_retries:
+                        retry_number += 1
+                        delay = None
+                        if response.status in RETRY_AFTER_STATUSES:
+                            delay = _retry_after(response.headers)
+                        if delay is None:
+                            delay = backoff_time(self.backoff_factor, retry_number)
+                        logger.debug(f"Retry {retry_number}/{self.total_retries} for {url} after HTTP {response.status} in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                    if response.status >= 400:
+                        raise AsyncFetchError(url, f"{response.status} Error: {response.reason}", response.status)
+                    body = await response.read()
+                    if self.cache and response.status == 200 and self.cache.is_cacheable(response.headers):
+                        try:
+                            await asyncio.to_thread(self.cache.store, url, response.headers, [body])
+                        except OSError as e:
+                            logger.warning(f"Could not cache {url}: {e}")
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if retry_number >= self.total_retries:
+                    raise AsyncFetchError(url, f"{type(e).__name__}: {e}") from e
+                retry_number += 1
+                await asyncio.sleep(backoff_time(self.backoff_factor, retry_number))
+
+    def _read_cached(self, url):
+        with self.cache.open_body(url) as body:
+            return body.read()
+
+    def _refresh_cached(self, url, meta, headers):
+        self.cache.refresh(url, meta, headers)
+        return self._read_cached(url)
+
+    async def get_json(self, url):
+        body = await self.get_bytes(url)
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise AsyncFetchError(url, f"Invalid JSON: {e}") from e
+
+    async def get_json_many(self, urls):
+        """Fetch many URLs concurrently; returns one result per URL, either the decoded JSON or the exception."""
+        return await asyncio.gather(*(self.get_json(url) for url in urls), return_exceptions=True)
+
+
+def fetch_json_many(urls, **client_kwargs):
+    """Blocking helper: fetch urls concurrently on a fresh event loop (usable from any thread, e.g. a Qt worker)."""
+    async def run():
+        async with AsyncSefariaClient(**client_kwargs) as client:
+            return await client.get_json_many(urls)
+    return asyncio.run(run())
@@ -0,0 +1,100 @@
+"""
+Compare collecting a reading list with the old recursive category-path search (one toc walk per
+selected item) against TocIndex parent pointers, on a synthetic toc with a large selection.
+
+Usage: python benchmarks/bench_save_selection.py [--categories N] [--books N] [--depth N] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sefaria_toc import TocIndex, collect_reading_list
+
+
+def synthetic_toc(categories, books, depth):
+    """categories top-level categories, each a chain of depth subcategories holding books books, all selected."""
+    toc = []
+    for c in range(categories):
+        top = {"category": f"Category {c}", "heCategory": f"קטגוריה {c}", "selected": True, "contents": []}
+        node = top
+        for d in range(1, depth):
+            sub = {"category": f"Sub {c}.{d}", "heCategory": f"תת {c}.{d}", "selected": True, "contents": []}
+            node["contents"].append(sub)
+            node = sub
+        for b in range(books):
+            node["contents"].append({"title": f"Book {c}.{b}", "heTitle": f"ספר {c}.{b}", "selected": True})
+        toc.append(top)
+    return toc
+
+
+def legacy_category_path(item, toc, path=None):
+    """The removed BookSelectionTab.get_category_path."""
+    if path is None:
+        path = []
+    for toc_item in toc:
+        he_title = toc_item.get("heTitle", toc_item.get("heCategory", ""))
+        if he_title == item.get("heTitle", item.get("heCategory", "")):
+            return path + [he_title]
+        sub_path = legacy_category_path(item, toc_item.get("contents", []), path + [he_title])
+        if sub_path:
+            return sub_path
+    return None
+
+
+def legacy_collect(toc):
+    reading_list = []
+    he_to_en = {}
+    unique_items = set()
+    def collect_selections(items):
+        for item in items:
+            if item.get("selected", False):
+                he_title = item.get("heTitle", item.get("heCategory", ""))
+                en_title = item.get("title", item.get("category", ""))
+                if he_title and en_title:
+                    categories = legacy_category_path(item, toc)
+                    if categories:
+                        if categories[-1] == he_title:
+                            categories = categories[:-1]
+                        if (he_title, en_title) not in unique_items:
+                            unique_items.add((he_title, en_title))
+                            reading_list.append({"he_title": he_title, "en_title": en_title, "categories": categories})
+                            he_to_en[he_title] = en_title
+            collect_selections(item.get("contents", []))
+    collect_selections(toc)
+    return reading_list, he_to_en
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    toc = synthetic_toc(args.categories, args.books, args.depth)
+    toc_index = TocIndex(toc)
+    print(f"{len(toc_index)} toc items, all selected, {args.repeat} runs per mode")
+
+    legacy_seconds, legacy_result = best_time(lambda: legacy_collect(toc), args.repeat)
+    index_seconds, index_result = best_time(lambda: collect_reading_list(toc_index), args.repeat)
+    if legacy_result != index_result:
+        raise SystemExit("Results differ between the recursive search and parent pointers")
+    print(f"recursive search: {legacy_seconds:.3f} s")
+    print(f" parent pointers: {index_seconds:.3f} s ({legacy_seconds / max(index_seconds, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
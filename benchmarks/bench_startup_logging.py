@@ -0,0 +1,95 @@
+"""
+Time the selection window's startup work (TocLoader.load on a warm snapshot, then building every
+tree row) under each logging mode: INFO (timing events only, the default), DEBUG without per-item
+tracing, and DEBUG with tracing. Each run is a fresh subprocess logging to /dev/null.
+
+Usage: python benchmarks/bench_startup_logging.py [--categories N] [--books N] [--depth N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_save_selection import synthetic_toc
+from sefaria_toc import TocIndex, collect_reading_list, write_json_atomic
+
+MODES = {"info": ("INFO", False), "debug": ("DEBUG", False), "trace": ("DEBUG", True)}
+
+
+def run_child(mode, work_dir):
+    import book_selection
+    level, trace = MODES[mode]
+    book_selection.configure_logging(level, trace)
+    toc_file = os.path.join(work_dir, "sefaria_toc.json")
+    selection_file = os.path.join(work_dir, "book_selection.json")
+
+    start_time = time.perf_counter()
+    result = book_selection.TocLoader(toc_file, selection_file).load()
+    model = book_selection.TocModel()
+    model.set_toc(result["toc_index"])
+    stack = [book_selection.QModelIndex()]
+    rows = 0
+    while stack:
+        parent = stack.pop()
+        for row in range(model.rowCount(parent)):
+            stack.append(model.index(row, 0, parent))
+            rows += 1
+    elapsed = time.perf_counter() - start_time
+    print(json.dumps({"mode": mode, "seconds": elapsed, "rows": rows}))
+
+
+def prepare(work_dir, categories, books, depth):
+    """Write a synthetic toc, a selection of every other book and a warm snapshot into work_dir."""
+    toc = synthetic_toc(categories, books, depth)
+    toc_file = os.path.join(work_dir, "sefaria_toc.json")
+    write_json_atomic(toc_file, toc)
+    toc_index = TocIndex(toc)
+    for i, item in enumerate(toc_index.items.values()):
+        item["selected"] = "contents" not in item and i % 2 == 0
+    reading_list, he_to_en = collect_reading_list(toc_index)
+    write_json_atomic(os.path.join(work_dir, "book_selection.json"), {"reading_list": reading_list, "he_to_en": he_to_en})
+    run_mode("info", work_dir)  # Writes the snapshot
+    return len(toc_index), len(reading_list)
+
+
+def run_mode(mode, work_dir):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--work-dir", work_dir],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.work_dir)
+        return
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        items, selected = prepare(work_dir, args.categories, args.books, args.depth)
+        print(f"{items} toc items, {selected} selected, {args.repeat} runs per mode")
+        for mode in MODES:
+            best = min((run_mode(mode, work_dir) for _ in range(args.repeat)), key=lambda run: run["seconds"])
+            print(f"{mode:>6}: {best['seconds']:.3f} s ({best['rows']} rows)")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
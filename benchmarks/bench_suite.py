@@ -0,0 +1,293 @@
+"""
+Time the hot paths of title_info and the selection window on generated Sefaria-shaped TOCs at several
+scales, and compare the results with a previous run.
+
+At scale 1 the generated TOC has about 1,000 items: five corpora of three sections with 8 books each,
+every book commented on by six commentators (one of them modern, so skipped by the commentary index),
+Tanakh books also by two targums. Books per section grow linearly with the scale.
+
+Benchmarks: build_shadow_trees (one title, from the file, no cache), build_shadow_trees_for_titles (every
+base text), search_shadow_trees and CommentaryIndex.search (every commentary path of a title),
+extract_hebrew_data (every base text), and on the selection side TocIndex, build_he_to_en (the he->en
+mappings), mark_selected, collect_reading_list (category paths for a save), TitleSearchIndex build and
+search, and populate_tree (TocModel.set_toc and expanding every row of a QTreeView under offscreen Qt;
+skipped when PyQt6 is not installed).
+
+Usage:
+    python benchmarks/bench_suite.py [--scales 1 10 100] [--repeat N] [--output results.json]
+                                     [--baseline previous.json] [--threshold 0.2] [--only NAME ...]
+    python benchmarks/bench_suite.py --write-toc toc.json [--scales N]
+
+With --baseline, a benchmark regresses when it is more than --threshold (a fraction) slower than in the
+baseline and at least --min-delta seconds slower; the exit status is 1 if any benchmark regressed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import title_info
+from commentary_index import CommentaryIndex
+from sefaria_toc import TitleSearchIndex, TocIndex, build_he_to_en, collect_reading_list, mark_selected, write_json_atomic
+
+CORPORA = [
+    ("Tanakh", "תנ\"ך", ["Torah", "Prophets", "Writings"], ["תורה", "נביאים", "כתובים"]),
+    ("Mishnah", "משנה", ["Seder Zeraim", "Seder Moed", "Seder Nashim"], ["סדר זרעים", "סדר מועד", "סדר נשים"]),
+    ("Talmud", "תלמוד", ["Bavli", "Yerushalmi", "Minor Tractates"], ["בבלי", "ירושלמי", "מסכתות קטנות"]),
+    ("Midrash", "מדרש", ["Aggadah", "Halakhah", "Minor Midrashim"], ["אגדה", "הלכה", "מדרשים קטנים"]),
+    ("Halakhah", "הלכה", ["Mishneh Torah", "Shulchan Arukh", "Tur"], ["משנה תורה", "שולחן ערוך", "טור"]),
+]
+COMMENTATORS = [
+    ("Rashi", "רש\"י", "Classic commentary."), ("Ramban", "רמב\"ן", "Medieval commentary."),
+    ("Ibn Ezra", "אבן עזרא", "Grammatical commentary."), ("Sforno", "ספורנו", "Renaissance commentary."),
+    ("Malbim", "מלבי\"ם", "Nineteenth century commentary."), ("Steinsaltz", "שטיינזלץ", "A modern commentary."),
+]
+TARGUMS = [("Onkelos", "אונקלוס"), ("Targum Jonathan", "תרגום יונתן")]
+BOOKS_PER_SECTION = 8
+
+
+def generate_toc(scale=1, seed=0):
+    """A Sefaria-shaped TOC: categories with contents, books with categories, commentaries and targums with
+    dependence and base_text_titles, and enShortDesc (some marking modern commentaries)."""
+    rng = random.Random(seed)
+    toc = []
+    for en_corpus, he_corpus, en_sections, he_sections in CORPORA:
+        corpus = {"category": en_corpus, "heCategory": he_corpus, "contents": []}
+        books = []
+        for en_section, he_section in zip(en_sections, he_sections):
+            section = {"category": en_section, "heCategory": he_section, "contents": []}
+            for b in range(BOOKS_PER_SECTION * scale):
+                book = {
+                    "title": f"{en_corpus} {en_section} {b}", "heTitle": f"{he_section} {b}",
+                    "categories": [en_corpus, en_section], "order": b,
+                    "enShortDesc": f"Book {b} of {en_section}." if rng.random() < 0.5 else "",
+                }
+                section["contents"].append(book)
+                books.append((en_section, book))
+            corpus["contents"].append(section)
+
+        commentary = {"category": "Commentary", "heCategory": "מפרשים", "contents": []}
+        for en_name, he_name, description in COMMENTATORS:
+            commentator = {"category": en_name, "heCategory": he_name, "contents": []}
+            for en_section, he_section in zip(en_sections, he_sections):
+                sub = {"category": en_section, "heCategory": he_section, "contents": []}
+                section_titles = []
+                for book_section, book in books:
+                    if book_section != en_section:
+                        continue
+                    section_titles.append(book["title"])
+                    sub["contents"].append({
+                        "title": f"{en_name} on {book['title']}", "heTitle": f"{he_name} על {book['heTitle']}",
+                        "categories": [en_corpus, "Commentary", en_name, en_section], "dependence": "Commentary",
+                        "base_text_titles": [book["title"]], "enShortDesc": description,
+                    })
+                # A commentary on a whole section, as Sefaria has for some collections
+                sub["contents"].append({
+                    "title": f"{en_name} on {en_section}", "heTitle": f"{he_name} על {he_section}",
+                    "categories": [en_corpus, "Commentary", en_name, en_section], "dependence": "Commentary",
+                    "base_text_titles": section_titles[:2], "enShortDesc": description,
+                })
+                commentator["contents"].append(sub)
+            commentary["contents"].append(commentator)
+        corpus["contents"].append(commentary)
+
+        if en_corpus == "Tanakh":
+            targum = {"category": "Targum", "heCategory": "תרגומים", "contents": []}
+            for en_name, he_name in TARGUMS:
+                targum["contents"].append({"category": en_name, "heCategory": he_name, "contents": [
+                    {
+                        "title": f"{en_name} {book['title']}", "heTitle": f"{he_name} {book['heTitle']}",
+                        "categories": [en_corpus, "Targum", en_name, book_section], "dependence": "Targum",
+                        "base_text_titles": [book["title"]],
+                    }
+                    for book_section, book in books
+                ]})
+            corpus["contents"].append(targum)
+        toc.append(corpus)
+    return toc
+
+
+def base_titles(toc):
+    return [book["title"] for corpus in toc for section in corpus["contents"]
+            if section["category"] not in ("Commentary", "Targum") for book in section["contents"]]
+
+
+def index_api_data(title):
+    """A /api/v2/raw/index response for title."""
+    return {"title": title, "schema": {
+        "sectionNames": ["Chapter", "Verse"], "heSectionNames": ["פרק", "פסוק"], "lengths": [50, 1533],
+    }}
+
+
+def texts_data(title):
+    """A versions list as title_info fetches it, half Hebrew."""
+    return {"versions": [
+        {"versionTitle": f"{title} version {v}", "language": "he" if v % 2 == 0 else "en",
+         "versionSource": f"https://example.org/{v}", "status": "locked"}
+        for v in range(12)
+    ]}
+
+
+def measure(func, repeat):
+    """Run func repeat times with title_info's progress output discarded; returns timings and the last result."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start_time)
+    return {"min": round(min(timings), 6), "median": round(statistics.median(timings), 6)}, result
+
+
+def title_info_benchmarks(toc, toc_file):
+    titles = base_titles(toc)
+    title = titles[0]
+    commentary_index = CommentaryIndex.from_toc(toc)
+    shadow_trees = commentary_index.shadow_trees_for(title)
+    search_paths = [entry["path"] for entry in commentary_index.entries] + [["Tanakh", "Torah", "Missing"]]
+    fetched = {t: (index_api_data(t), texts_data(t)) for t in titles}
+    return {
+        "build_shadow_trees": lambda: title_info.build_shadow_trees(toc_file, title, use_cache=False),
+        "build_shadow_trees_for_titles": lambda: title_info.build_shadow_trees_for_titles(toc_file, use_cache=False),
+        "search_shadow_trees": lambda: [title_info.search_shadow_trees(shadow_trees, path) for path in search_paths],
+        "commentary_index_search": lambda: [commentary_index.search(title, path) for path in search_paths],
+        "extract_hebrew_data": lambda: [
+            title_info.extract_hebrew_data(index_data, texts, shadow_trees, t) for t, (index_data, texts) in fetched.items()
+        ],
+    }
+
+
+def selection_benchmarks(toc):
+    toc_index = TocIndex(toc)
+    he_to_en = build_he_to_en(toc)
+    # Every third item selected, as a saved reading list would have it
+    selected = {he: en for i, (he, en) in enumerate(he_to_en.items()) if i % 3 == 0}
+    mark_selected(toc_index, selected)
+    search_index = TitleSearchIndex(toc_index, he_to_en)
+    queries = ["Rashi on", "על", "Torah 3", "Halakhah Tur 1", "no such book"]
+    return {
+        "toc_index": lambda: TocIndex(toc),
+        "build_he_to_en": lambda: build_he_to_en(toc),
+        "mark_selected": lambda: mark_selected(toc_index, selected),
+        "collect_reading_list": lambda: collect_reading_list(toc_index),
+        "title_search_index": lambda: TitleSearchIndex(toc_index, he_to_en),
+        "title_search": lambda: [search_index.visible_ids(search_index.search(query)) for query in queries],
+    }
+
+
+def qt_benchmarks(toc):
+    """populate_tree as the selection window does it, under offscreen Qt; {} without PyQt6."""
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    try:
+        import book_selection
+        from PyQt6.QtWidgets import QApplication, QTreeView
+    except ImportError as e:
+        print(f"Skipping populate_tree: {e}")
+        return {}
+    app = QApplication.instance() or QApplication([])
+    toc_index = TocIndex(toc)
+    model = book_selection.TocModel()
+    view = QTreeView()
+    view.setModel(model)
+    view.resize(800, 600)
+
+    def populate_tree():
+        model.set_toc(toc_index)
+        view.expandAll()
+        app.processEvents()
+        return model.rowCount()
+
+    return {"populate_tree": populate_tree}
+
+
+def run_scale(scale, repeat, only):
+    toc = generate_toc(scale)
+    work_dir = tempfile.mkdtemp()
+    try:
+        toc_file = os.path.join(work_dir, "toc.json")
+        write_json_atomic(toc_file, toc)
+        benchmarks = {}
+        benchmarks.update(title_info_benchmarks(toc, toc_file))
+        benchmarks.update(selection_benchmarks(toc))
+        if not only or "populate_tree" in only:
+            benchmarks.update(qt_benchmarks(toc))
+        results = {"toc_items": len(TocIndex(toc)), "toc_bytes": os.path.getsize(toc_file), "benchmarks": {}}
+        for name, func in benchmarks.items():
+            if only and name not in only:
+                continue
+            results["benchmarks"][name], _ = measure(func, repeat)
+            print(f"{scale:>4}x {name:>30}: {results['benchmarks'][name]['min']:.4f} s")
+        return results
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print current vs baseline minimum timings; returns the regressed (scale, benchmark) pairs."""
+    regressions = []
+    for scale, scale_results in results["scales"].items():
+        base_scale = baseline.get("scales", {}).get(scale)
+        if base_scale is None:
+            continue
+        for name, timing in scale_results["benchmarks"].items():
+            base_timing = base_scale["benchmarks"].get(name)
+            if base_timing is None:
+                continue
+            current, previous = timing["min"], base_timing["min"]
+            regressed = current > previous * (1 + threshold) and current - previous >= min_delta
+            ratio = current / previous if previous else float("inf")
+            print(f"{scale:>4}x {name:>30}: {previous:.4f} s -> {current:.4f} s ({ratio:.2f}x){'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((scale, name))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--write-toc", metavar="FILE", help="only write the generated TOC for the first scale to FILE")
+    args = parser.parse_args()
+
+    if args.write_toc:
+        toc = generate_toc(args.scales[0])
+        write_json_atomic(args.write_toc, toc)
+        print(f"Wrote {len(TocIndex(toc))} items to {args.write_toc}")
+        return
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "scales": {str(scale): run_scale(scale, args.repeat, args.only) for scale in args.scales},
+    }
+    if args.output:
+        write_json_atomic(args.output, results)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} benchmarks slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
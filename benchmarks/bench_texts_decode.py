@@ -0,0 +1,102 @@
+"""
+Compare peak RSS and time of decoding a v3 texts response with json.loads (what response.json() does)
+against stream_texts_versions, which keeps only the version metadata. Each mode runs in its own
+subprocess so peak RSS is not shared between them.
+
+Without --input, a synthetic response shaped like a Talmud tractate is generated: --versions
+versions of --dafs amudim with --segments segments each.
+
+Usage: python benchmarks/bench_texts_decode.py [--input response.json] [--versions N] [--dafs N] [--segments N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["json", "stream", "stream-python"]
+
+
+def run_child(mode, input_file):
+    import json_stream
+    import title_info
+    if mode == "stream-python":
+        json_stream.ijson = None
+    with open(input_file, "rb") as f:
+        body = f.read()
+    baseline_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start_time = time.perf_counter()
+    if mode == "json":
+        data = json.loads(body)
+        versions = [{field: version.get(field) for field in title_info.VERSION_FIELDS} for version in data["versions"]]
+    else:
+        # Feed the body in 64 KiB chunks, as iter_content would
+        chunks = (body[i:i + 64 * 1024] for i in range(0, len(body), 64 * 1024))
+        versions = title_info.stream_texts_versions(json_stream.ChunkReader(chunks))["versions"]
+    elapsed = time.perf_counter() - start_time
+    # ru_maxrss is in KiB on Linux; the raw body is held in every mode, so report growth past it
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "seconds": elapsed, "peak_rss_mb": peak_rss_mb - baseline_rss_mb, "versions": len(versions)}))
+
+
+def synthetic_response(path, versions, dafs, segments):
+    segment = "אמר רבי יוחנן משום רבי שמעון בן יוחאי " * 6
+    text = [[f"{segment} {daf}:{line}" for line in range(segments)] for daf in range(dafs)]
+    response = {
+        "versions": [
+            {
+                "versionTitle": f"Version {v}", "language": "he" if v % 2 == 0 else "en",
+                "versionSource": f"https://example.org/{v}", "status": "locked", "text": text,
+            }
+            for v in range(versions)
+        ],
+        "available_versions": [{"versionTitle": f"Version {v}", "language": "he"} for v in range(versions)],
+        "ref": "Berakhot", "heRef": "ברכות",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(response, f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="a saved /api/v3/texts/{title} response")
+    parser.add_argument("--versions", type=int, default=6)
+    parser.add_argument("--dafs", type=int, default=126)
+    parser.add_argument("--segments", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.input)
+        return
+
+    input_file = args.input
+    if input_file is None:
+        fd, input_file = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        synthetic_response(input_file, args.versions, args.dafs, args.segments)
+    try:
+        print(f"{os.path.getsize(input_file) / 1024 / 1024:.1f} MB texts response, {args.repeat} runs per mode")
+        for mode in MODES:
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--input", input_file, "--child", mode],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(output))
+            best = min(runs, key=lambda run: run["seconds"])
+            print(f"{mode:>14}: {best['seconds']:.3f} s, peak RSS +{max(run['peak_rss_mb'] for run in runs):.1f} MB, {best['versions']} versions")
+    finally:
+        if input_file != args.input:
+            os.remove(input_file)
+
+
+if __name__ == "__main__":
+    main()
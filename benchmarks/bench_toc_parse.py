@@ -0,0 +1,74 @@
+"""
+Compare peak RSS and time of building the commentary index with json.load versus the streaming parser.
+Each mode runs in its own subprocess so peak RSS is not shared between them.
+
+Usage: python benchmarks/bench_toc_parse.py <index_file> [--scale N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["json", "stream", "stream-python"]
+
+
+def run_child(mode, index_file):
+    import commentary_index
+    if mode == "stream-python":
+        import json_stream
+        json_stream.ijson = None
+    start_time = time.perf_counter()
+    entries = commentary_index.read_commentary_entries(index_file, streaming=mode != "json")
+    elapsed = time.perf_counter() - start_time
+    # ru_maxrss is in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "seconds": elapsed, "peak_rss_mb": peak_rss_mb, "entries": len(entries)}))
+
+
+def scaled_copy(index_file, scale):
+    with open(index_file, "r", encoding="utf-8") as f:
+        toc = json.load(f)
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(toc * scale, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index_file")
+    parser.add_argument("--scale", type=int, default=1, help="repeat the TOC N times to simulate growth")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.index_file)
+        return
+
+    index_file = scaled_copy(args.index_file, args.scale) if args.scale > 1 else args.index_file
+    try:
+        print(f"{os.path.getsize(index_file) / 1024 / 1024:.1f} MB TOC, {args.repeat} runs per mode")
+        for mode in MODES:
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), index_file, "--child", mode],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(output))
+            best = min(runs, key=lambda run: run["seconds"])
+            print(f"{mode:>14}: {best['seconds']:.3f} s, peak RSS {max(run['peak_rss_mb'] for run in runs):.1f} MB, {best['entries']} entries")
+    finally:
+        if index_file != args.index_file:
+            os.remove(index_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure, per title, the bytes and latency of the Texts phase in metadata-only mode (the versions
+endpoint) against the full v3 texts call it replaces. Requests bypass the HTTP cache.
+
+Usage: python benchmarks/bench_versions_fetch.py [TITLE ...] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import title_info
+
+
+def measure(session, url, repeat):
+    """Best latency over repeat requests and the decoded body size in bytes."""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        response = session.get(url, headers={"accept": "application/json"}, timeout=30)
+        response.raise_for_status()
+        size = len(response.content)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return {"bytes": size, "seconds": round(best, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("titles", nargs="*", default=["Genesis", "Psalms", "Berakhot", "Mishneh Torah, Prayer"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    session = title_info.create_session(use_cache=False)
+    results = {}
+    for title in args.titles:
+        try:
+            versions = measure(session, title_info.versions_url(title), args.repeat)
+            texts = measure(session, title_info.phase_url("Texts", title), args.repeat)
+        except Exception as e:
+            print(f"{title}: {e}")
+            continue
+        results[title] = {
+            "versions": versions,
+            "texts": texts,
+            "bytes_saved": texts["bytes"] - versions["bytes"],
+            "seconds_saved": round(texts["seconds"] - versions["seconds"], 4),
+        }
+        print(f"{title:>30}: versions {versions['bytes'] / 1024:8.1f} KB {versions['seconds']:.3f} s | "
+              f"texts {texts['bytes'] / 1024:8.1f} KB {texts['seconds']:.3f} s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
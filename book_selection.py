@@ -1,18 +1,531 @@
 import os
-os.environ["QT_QPA_PLATFORM"] = "xcb"  # Force X11 backend to avoid Wayland issues on Linux
+os.environ.setdefault("QT_QPA_PLATFORM", "xcb")  # Default to X11 to avoid Wayland issues on Linux
 
-from PyQt6.QtWidgets import QApplication, QMainWindow, QTreeWidget, QTreeWidgetItem, QPushButton, QVBoxLayout, QWidget, QDialog, QTextBrowser, QMessageBox, QProgressDialog, QFileDialog
-from PyQt6.QtCore import Qt
-import requests
+from PyQt6.QtWidgets import QApplication, QMainWindow, QLineEdit, QTreeView, QMenu, QPushButton, QVBoxLayout, QWidget, QDialog, QTextBrowser, QMessageBox, QProgressDialog, QFileDialog
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex, QObject, QThread, pyqtSignal
+import argparse
 import json
 import sys
 import logging
+import threading
 import time
+import sefaria_toc
+from sefaria_toc import (
+    TOC_URL, TitleSearchIndex, TocIndex, build_he_to_en, carry_over_selections, collect_reading_list, diff_toc,
+    display_title, fetch_toc, read_local_toc, write_json_atomic, write_toc_snapshot,
+)
 
-# Set up logging for debugging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-item tracing (every marked/toggled item, whole reading lists); checked before formatting anything
+TRACE = False
+
+
+def configure_logging(level=None, trace=None):
+    """
+    Set the log level (default: SEFARIA_LOG_LEVEL, else INFO) and per-item tracing (default: SEFARIA_TRACE=1).
+    Tracing implies DEBUG. At INFO only aggregate timing events are logged. Replaces the root handlers, so
+    it is only called when running as the application, never on import.
+    """
+    global TRACE
+    if trace is None:
+        trace = os.environ.get("SEFARIA_TRACE", "") not in ("", "0")
+    if level is None:
+        level = "DEBUG" if trace else os.environ.get("SEFARIA_LOG_LEVEL", "INFO")
+    if not isinstance(logging.getLevelName(level.upper()), int):
+        print(f"Unknown log level {level!r}, using INFO", file=sys.stderr)
+        level = "INFO"
+    logging.basicConfig(level=level.upper(), format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    TRACE = trace and logger.isEnabledFor(logging.DEBUG)
+
+
+def log_timing(event, start_time, **fields):
+    """Log one structured timing event: a JSON object with the event name, elapsed seconds and counts."""
+    if logger.isEnabledFor(logging.INFO):
+        fields = {"event": event, "seconds": round(time.perf_counter() - start_time, 4), **fields}
+        logger.info(json.dumps(fields, ensure_ascii=False))
+
+
+def mark_selected(toc_index, selected_he_to_en):
+    """sefaria_toc.mark_selected, tracing every item when TRACE is on."""
+    count = sefaria_toc.mark_selected(toc_index, selected_he_to_en)
+    if TRACE:
+        for item in toc_index.items.values():
+            logger.debug(f"Updated item: {display_title(item)}, selected={item['selected']}")
+    return count
+
+
+# Filter results with at most this many matches are shown expanded
+MAX_EXPANDED_MATCHES = 50
+
+
+class TocLoadCancelled(Exception):
+    pass
+
+
+class TocLoader(QObject):
+    """
+    Loads the toc (from the local file if recent, otherwise from Sefaria's API), builds he_to_en
+    and marks saved selections, all off the GUI thread. Run it via QThread: progress is reported
+    through the progress signal and cancel() stops it between chunks/items.
+    """
+    progress = pyqtSignal(int, str)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, toc_file="sefaria_toc.json", selection_file="book_selection.json", old_index=None):
+        super().__init__()
+        self.toc_file = toc_file
+        self.selection_file = selection_file
+        self.old_index = old_index
+        self._cancelled = False
+
+    def cancel(self):
+        """Request cancellation; safe to call from the GUI thread while run() is executing."""
+        self._cancelled = True
+
+    def check_cancelled(self):
+        if self._cancelled:
+            raise TocLoadCancelled()
+
+    def run(self):
+        try:
+            result = self.load() if self.old_index is None else self.refresh()
+        except TocLoadCancelled:
+            logger.debug("TOC loading cancelled")
+            self.cancelled.emit()
+        except Exception as e:
+            logger.error(f"Error fetching toc from API: {str(e)}")
+            self.failed.emit(str(e))
+        else:
+            self.loaded.emit(result)
+
+    def load(self):
+        logger.debug("Starting fetch_toc")
+        load_start = time.perf_counter()
+        self.progress.emit(0, "שואב נתונים מ-Sefaria...")
+        start_time = time.perf_counter()
+        loaded = self.load_local_toc()
+        if loaded is None:
+            toc, saved = self.download_toc()
+            he_to_en = None
+        else:
+            saved = True
+            toc, he_to_en = loaded
+        source = "download" if loaded is None else "snapshot" if he_to_en is not None else "json"
+        log_timing("toc_read", start_time, source=source)
+        self.check_cancelled()
+
+        # Build he_to_en mappings for all items, unless the snapshot already had them
+        self.progress.emit(60, "בונה מיפוי שמות...")
+        if he_to_en is None:
+            start_time = time.perf_counter()
+            he_to_en = build_he_to_en(toc)
+            log_timing("he_to_en", start_time, mappings=len(he_to_en))
+            if saved:
+                self.save_snapshot(toc, he_to_en)
+        self.check_cancelled()
+        start_time = time.perf_counter()
+        toc_index = TocIndex(toc)
+        log_timing("toc_index", start_time, items=len(toc_index))
+        start_time = time.perf_counter()
+        search_index = TitleSearchIndex(toc_index, he_to_en)
+        log_timing("search_index", start_time, grams=len(search_index.grams))
+
+        # Load existing selections if available
+        self.progress.emit(80, "מסמן בחירות שמורות...")
+        result = {
+            "toc": toc, "he_to_en": he_to_en, "reading_list": [], "selected_he_to_en": {},
+            "toc_index": toc_index, "search_index": search_index,
+        }
+        selected_he_to_en = {}
+        try:
+            with open(self.selection_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            result["reading_list"] = data.get("reading_list", [])
+            result["selected_he_to_en"] = selected_he_to_en = data.get("he_to_en", {})
+            if TRACE:
+                logger.debug(f"Loaded existing JSON: reading_list={result['reading_list']}, he_to_en={selected_he_to_en}")
+        except FileNotFoundError:
+            logger.debug("No existing book_selection.json found")
+        except ValueError as e:
+            logger.error(f"Error loading {self.selection_file}: {str(e)}")
+        # Update toc with saved selections
+        start_time = time.perf_counter()
+        selected = mark_selected(toc_index, selected_he_to_en)
+        log_timing("mark_selections", start_time, selected=selected)
+        self.check_cancelled()
+
+        self.progress.emit(100, "הושלם")
+        log_timing("toc_load", load_start, items=len(toc_index))
+        return result
+
+    def refresh(self):
+        """Download the current toc and diff it against old_index; the GUI patches the tree and carries selections over."""
+        logger.debug("Starting toc refresh")
+        refresh_start = time.perf_counter()
+        self.progress.emit(0, "שואב נתונים מ-Sefaria...")
+        toc, saved = self.download_toc()
+        self.check_cancelled()
+        self.progress.emit(60, "בונה מיפוי שמות...")
+        he_to_en = build_he_to_en(toc)
+        if saved:
+            self.save_snapshot(toc, he_to_en)
+        self.check_cancelled()
+        toc_index = TocIndex(toc)
+        self.progress.emit(80, "משווה לנתונים הקיימים...")
+        diff = diff_toc(self.old_index, toc_index)
+        self.progress.emit(100, "הושלם")
+        log_timing("toc_refresh", refresh_start, items=len(toc_index), added=len(diff["added"]),
+                   removed=len(diff["removed"]), renamed=len(diff["renamed"]))
+        return {
+            "toc": toc, "he_to_en": he_to_en, "toc_index": toc_index, "diff": diff,
+            "search_index": TitleSearchIndex(toc_index, he_to_en),
+        }
+
+    def load_local_toc(self):
+        """Return (toc, he_to_en) from the local file if it is recent (see read_local_toc), else None."""
+        try:
+            self.progress.emit(10, "טוען נתונים מקובץ מקומי...")
+            loaded = read_local_toc(self.toc_file)
+            if loaded is not None:
+                source = "snapshot" if loaded[1] is not None else "file"
+                logger.debug(f"Loaded TOC from {source} {self.toc_file}: {len(loaded[0])} items")
+                self.progress.emit(50, "טוען נתונים מקובץ מקומי...")
+            return loaded
+        except Exception as e:
+            logger.error(f"Error checking/loading local TOC file: {str(e)}")
+        return None
+
+    def save_snapshot(self, toc, he_to_en):
+        """(Re)generate the compact snapshot after the toc was parsed from or saved to the JSON file."""
+        try:
+            write_toc_snapshot(toc, self.toc_file, he_to_en)
+            logger.debug(f"Saved TOC snapshot of {self.toc_file}")
+        except Exception as e:
+            logger.error(f"Error saving TOC snapshot: {str(e)}")
+
+    def download_toc(self):
+        """Download the toc from Sefaria's API in chunks, reporting progress, and save it locally.
+        Returns (toc, saved), saved telling whether the local file now holds this toc."""
+        logger.debug(f"Sending request to Sefaria API: {TOC_URL}")
+
+        def on_chunk(received, total):
+            self.check_cancelled()
+            if total:
+                percent = 5 + min(45, 45 * received // total)
+            else:
+                percent = 5
+            self.progress.emit(percent, f"מוריד נתונים מ-Sefaria... ({received // 1024} KB)")
+
+        toc = fetch_toc(on_chunk)
+        self.progress.emit(50, "מעבד נתונים...")
+        logger.debug(f"Received toc data from API: {len(toc)} items")
+        # Save TOC to local file
+        try:
+            write_json_atomic(self.toc_file, toc)
+            logger.debug(f"Saved TOC to {self.toc_file}")
+        except Exception as e:
+            logger.error(f"Error saving TOC to file: {str(e)}")
+            return toc, False
+        return toc, True
+
+
+class JsonFileWriter(QObject):
+    """
+    Writes JSON files on its own thread, atomically (see write_json_atomic). save() only records the
+    latest data per path, so rapid saves to the same file coalesce into one write; saved or failed
+    is emitted once the file is on disk. Callers must not mutate data after passing it to save().
+    """
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+    _wake = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.writer_thread = QThread()
+        self.moveToThread(self.writer_thread)
+        self._wake.connect(self.flush)
+        self.writer_thread.start()
+
+    def save(self, path, data):
+        with self._lock:
+            self._pending[path] = data
+        self._wake.emit()
+
+    def flush(self):
+        """Write every pending file; runs on the writer thread, or directly from stop()."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                path = next(iter(self._pending))
+                data = self._pending.pop(path)
+            try:
+                write_json_atomic(path, data)
+            except Exception as e:
+                logger.error(f"Error writing {path}: {str(e)}")
+                self.failed.emit(path, str(e))
+            else:
+                logger.debug(f"Successfully wrote to {path}")
+                self.saved.emit(path)
+
+    def stop(self):
+        """Stop the writer thread, then write anything still pending so no save is lost on exit."""
+        self.writer_thread.quit()
+        self.writer_thread.wait()
+        self.flush()
+
+
+class _TocNode:
+    """
+    A toc item as seen by TocModel: its stable id and item dict, its parent node and row, lazily built
+    child nodes, and whether all its children are shown while a filter is active.
+    """
+    __slots__ = ("node_id", "item", "parent", "row", "children", "show_all")
+
+    def __init__(self, node_id, item, parent, row, show_all=True):
+        self.node_id = node_id
+        self.item = item
+        self.parent = parent
+        self.row = row
+        self.children = None
+        self.show_all = show_all
+
+
+class TocModel(QAbstractItemModel):
+    """
+    Item model over the in-memory toc: rows are created on demand from the toc dicts (items without
+    a Hebrew title/category are hidden with their sub-items) and check state is read from and written
+    to each item's "selected" flag, so the toc is never copied into widget items.
+    A filter (set_filter) limits rows to the matches, their ancestors and everything below a match.
+    """
+    NodeIdRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.toc_index = TocIndex([])
+        self.visible_ids = None
+        self.matched_ids = set()
+        self.root = _TocNode(None, None, None, 0)
+
+    def set_toc(self, toc_index):
+        self.beginResetModel()
+        self.toc_index = toc_index
+        self.visible_ids = None
+        self.matched_ids = set()
+        self.root = _TocNode(None, None, None, 0)
+        self.endResetModel()
+
+    def set_filter(self, visible_ids, matched_ids):
+        """Show only visible_ids (None: everything) with matched_ids' whole subtrees. Rows are rebuilt lazily."""
+        self.beginResetModel()
+        self.visible_ids = visible_ids
+        self.matched_ids = set(matched_ids or ())
+        self.root = _TocNode(None, None, None, 0, show_all=visible_ids is None)
+        self.endResetModel()
+
+    def is_filtered(self):
+        return self.visible_ids is not None
+
+    def _shown(self, node, child_id):
+        return display_title(self.toc_index.items[child_id]) and (node.show_all or child_id in self.visible_ids)
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def _child_ids(self, node):
+        return self.toc_index.roots if node.node_id is None else self.toc_index.children[node.node_id]
+
+    def _children(self, node):
+        if node.children is None:
+            items = self.toc_index.items
+            child_ids = [child_id for child_id in self._child_ids(node) if self._shown(node, child_id)]
+            node.children = [
+                _TocNode(child_id, items[child_id], node, row, node.show_all or child_id in self.matched_ids)
+                for row, child_id in enumerate(child_ids)
+            ]
+        return node.children
+
+    def index_for(self, node_id):
+        """Model index of node_id, building rows along its path; invalid if it is hidden or filtered out."""
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = self.toc_index.parent[node_id]
+        node = self.root
+        index = QModelIndex()
+        for path_id in reversed(path):
+            for child in self._children(node):
+                if child.node_id == path_id:
+                    break
+            else:
+                return QModelIndex()
+            node = child
+            index = self.createIndex(child.row, 0, child)
+        return index
+
+    def index(self, row, column, parent=QModelIndex()):
+        children = self._children(self._node(parent))
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._children(self._node(parent)))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        if node.children is not None:
+            return bool(node.children)
+        return any(self._shown(node, child_id) for child_id in self._child_ids(node))
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole and section == 0:
+            return "בחירת ספרים וקטגוריות"
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        item = node.item
+        if role == self.NodeIdRole:
+            return node.node_id
+        if role == Qt.ItemDataRole.DisplayRole:
+            return display_title(item)
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if item.get("selected", False) else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.UserRole:
+            return item
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        """Update selected state of the item in the toc without affecting sub-items."""
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        node = index.internalPointer()
+        item = node.item
+        self.toc_index.set_selected(node.node_id, Qt.CheckState(value) == Qt.CheckState.Checked)
+        if TRACE:
+            logger.debug(f"Updated toc item: {display_title(item)}, selected={item['selected']}")
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        return True
+
+    def update_toc(self, toc_index, id_map):
+        """
+        Switch to a refreshed toc_index (see diff_toc), patching rows instead of resetting the model:
+        only parents whose children changed get rows removed/inserted, renamed rows are updated in
+        place and expanded rows stay expanded.
+        """
+        start_time = time.perf_counter()
+        old_index = self.toc_index
+        items = toc_index.items
+
+        def new_child_ids(new_id):
+            child_ids = toc_index.roots if new_id is None else toc_index.children[new_id]
+            return [child_id for child_id in child_ids if display_title(items[child_id])]
+
+        # Remove rows whose item is gone (or now hidden) while the model still reads the old index
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if not node.children:
+                continue
+            parent_index = QModelIndex() if node is self.root else self.createIndex(node.row, 0, node)
+            new_ids = new_child_ids(None if node is self.root else id_map[node.node_id])
+            new_id_set = set(new_ids)
+            for row in reversed(range(len(node.children))):
+                if id_map.get(node.children[row].node_id) not in new_id_set:
+                    self.beginRemoveRows(parent_index, row, row)
+                    del node.children[row]
+                    self._renumber(node)
+                    self.endRemoveRows()
+            kept_ids = [id_map[child.node_id] for child in node.children]
+            kept_set = set(kept_ids)
+            if kept_ids != [child_id for child_id in new_ids if child_id in kept_set]:
+                # Siblings were reordered: rebuild just this parent's rows
+                self.beginRemoveRows(parent_index, 0, len(node.children) - 1)
+                node.children = []
+                self.endRemoveRows()
+            stack.extend(node.children)
+
+        # Every remaining node maps to the new index: switch ids and items over
+        renamed = []
+        stack = list(self.root.children or [])
+        while stack:
+            node = stack.pop()
+            old_title = display_title(node.item)
+            node.node_id = id_map[node.node_id]
+            node.item = items[node.node_id]
+            if display_title(node.item) != old_title:
+                renamed.append(node)
+            stack.extend(node.children or [])
+        self.toc_index = toc_index
+
+        # Insert the added rows, in order, under every expanded parent
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                continue  # Built from the new index when first expanded
+            parent_index = QModelIndex() if node is self.root else self.createIndex(node.row, 0, node)
+            for row, child_id in enumerate(new_child_ids(node.node_id)):
+                if row < len(node.children) and node.children[row].node_id == child_id:
+                    continue
+                self.beginInsertRows(parent_index, row, row)
+                node.children.insert(row, _TocNode(child_id, items[child_id], node, row))
+                self._renumber(node)
+                self.endInsertRows()
+            stack.extend(node.children)
+
+        for node in renamed:
+            index = self.createIndex(node.row, 0, node)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+        log_timing("tree_update", start_time, renamed_rows=len(renamed), items=len(toc_index))
+        self.refresh_check_states()
+
+    @staticmethod
+    def _renumber(node):
+        for row, child in enumerate(node.children):
+            child.row = row
+
+    def refresh_check_states(self):
+        """Tell views that "selected" flags changed in the toc (after load/clear), without rebuilding rows."""
+        stack = [(QModelIndex(), self.root)]
+        while stack:
+            parent_index, node = stack.pop()
+            if not node.children:
+                continue
+            first = self.index(0, 0, parent_index)
+            last = self.index(len(node.children) - 1, 0, parent_index)
+            self.dataChanged.emit(first, last, [Qt.ItemDataRole.CheckStateRole])
+            for child in node.children:
+                if child.children:
+                    stack.append((self.createIndex(child.row, 0, child), child))
+
+
 class BookSelectionTab(QWidget):
     """
     Standalone Book Selection tab for selecting books/categories from Sefaria's toc.
@@ -23,107 +536,143 @@ class BookSelectionTab(QWidget):
         super().__init__()
         logger.debug("Initializing BookSelectionTab")
         self.toc = []
+        self.toc_index = TocIndex([])
+        self.search_index = TitleSearchIndex(self.toc_index)
         self.he_to_en = {}
         self.reading_list = []
         self.selected_he_to_en = {}
-        self.fetch_toc()
+        self.toc_thread = None
+        self.toc_loader = None
+        self.pending_save_messages = {}
+        self.json_writer = JsonFileWriter()
+        self.json_writer.saved.connect(self.on_selection_saved)
+        self.json_writer.failed.connect(self.on_selection_save_failed)
+        QApplication.instance().aboutToQuit.connect(self.stop_json_writer)
+        QApplication.instance().aboutToQuit.connect(self.stop_toc_loading)
         self.setup_ui()
+        self.fetch_toc()
 
     def fetch_toc(self):
-        """Fetch toc from Sefaria API or load from local file if recent, and initialize he_to_en."""
-        logger.debug("Starting fetch_toc")
-        progress_dialog = QProgressDialog("שואב נתונים מ-Sefaria...", "ביטול", 0, 100, self)
-        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
-        progress_dialog.setValue(0)
-        toc_file = "sefaria_toc.json"
-        fetch_from_api = True
-    
-        # Check if local TOC file exists and is less than 14 days old
-        try:
-            if os.path.exists(toc_file):
-                file_mtime = os.path.getmtime(toc_file)
-                current_time = time.time()
-                two_weeks_ago = current_time - (14 * 24 * 60 * 60)  # 14 days in seconds
-                if file_mtime > two_weeks_ago:
-                    logger.debug(f"Loading TOC from local file: {toc_file}")
-                    with open(toc_file, "r", encoding="utf-8") as f:
-                        self.toc = json.load(f)
-                    logger.debug(f"Loaded TOC from file: {len(self.toc)} items")
-                    fetch_from_api = False
-        except Exception as e:
-            logger.error(f"Error checking/loading local TOC file: {str(e)}")
-            fetch_from_api = True
-    
-        # Fetch from API if needed
-        if fetch_from_api:
-            try:
-                logger.debug("Sending request to Sefaria API: https://www.sefaria.org/api/index/")
-                response = requests.get("https://www.sefaria.org/api/index/")
-                response.raise_for_status()
-                self.toc = response.json()
-                logger.debug(f"Received toc data from API: {len(self.toc)} items")
-                # Save TOC to local file
-                try:
-                    with open(toc_file, "w", encoding="utf-8") as f:
-                        json.dump(self.toc, f, ensure_ascii=False, indent=2)
-                    logger.debug(f"Saved TOC to {toc_file}")
-                except Exception as e:
-                    logger.error(f"Error saving TOC to file: {str(e)}")
-            except Exception as e:
-                logger.error(f"Error fetching toc from API: {str(e)}")
-                progress_dialog.close()
-                QMessageBox.warning(self, "שגיאה", f"שגיאה בשאיבת נתונים: {str(e)}")
-                self.toc = []
-                self.he_to_en = {}
-                progress_dialog.setValue(100)
-                return
-    
-        progress_dialog.setValue(50)
-        # Build he_to_en mappings for all items
-        def extract_mappings(items):
-            for item in items:
-                he_title = item.get("heTitle", item.get("heCategory", ""))
-                en_title = item.get("title", item.get("category", ""))
-                if he_title and en_title:
-                    self.he_to_en[he_title] = en_title
-                    logger.debug(f"Added mapping: {he_title} -> {en_title}")
-                extract_mappings(item.get("contents", []))
-        extract_mappings(self.toc)
-        logger.debug(f"Total he_to_en mappings: {len(self.he_to_en)}")
-        
-        # Load existing selections if available
-        try:
-            with open("book_selection.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.reading_list = data.get("reading_list", [])
-                self.selected_he_to_en = data.get("he_to_en", {})
-                logger.debug(f"Loaded existing JSON: reading_list={self.reading_list}, he_to_en={self.selected_he_to_en}")
-                # Update toc with saved selections
-                def mark_selections(items):
-                    for item in items:
-                        he_title = item.get("heTitle", item.get("heCategory", ""))
-                        if he_title in self.selected_he_to_en:
-                            item["selected"] = True
-                            logger.debug(f"Marked item as selected: {he_title}")
-                        else:
-                            item["selected"] = False
-                        mark_selections(item.get("contents", []))
-                mark_selections(self.toc)
-        except FileNotFoundError:
-            logger.debug("No existing book_selection.json found")
-        
-        progress_dialog.setValue(100)
-        progress_dialog.close()
-        logger.debug("Completed fetch_toc")
+        """Start loading the toc in a worker thread; the tree is populated when loading finishes."""
+        self.start_toc_loader(TocLoader(), self.on_toc_loaded, "שואב נתונים מ-Sefaria...")
+
+    def refresh_toc(self):
+        """Download the toc again and patch the tree with what changed, keeping the current selections."""
+        self.start_toc_loader(TocLoader(old_index=self.toc_index), self.on_toc_refreshed, "מרענן נתונים מ-Sefaria...")
+
+    def start_toc_loader(self, loader, on_loaded, label):
+        self.set_actions_enabled(False)
+        self.progress_dialog = QProgressDialog(label, "ביטול", 0, 100, self)
+        self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setValue(0)
+        self.progress_dialog.canceled.connect(self.cancel_toc_loading)
+
+        self.toc_thread = QThread(self)
+        self.toc_loader = loader
+        self.toc_loader.moveToThread(self.toc_thread)
+        self.toc_thread.started.connect(self.toc_loader.run)
+        self.toc_loader.progress.connect(self.on_toc_progress)
+        self.toc_loader.loaded.connect(on_loaded)
+        self.toc_loader.failed.connect(self.on_toc_failed)
+        self.toc_loader.cancelled.connect(self.on_toc_cancelled)
+        for signal in (self.toc_loader.loaded, self.toc_loader.failed, self.toc_loader.cancelled):
+            signal.connect(self.toc_thread.quit)
+        self.toc_thread.finished.connect(self.toc_loader.deleteLater)
+        self.toc_thread.start()
+
+    def cancel_toc_loading(self):
+        if self.toc_loader is not None:
+            self.toc_loader.cancel()
+
+    def stop_toc_loading(self):
+        """Cancel a running load and wait for the worker thread so the app can exit cleanly."""
+        if self.toc_thread is not None and self.toc_thread.isRunning():
+            self.cancel_toc_loading()
+            self.toc_thread.wait()
+
+    def stop_json_writer(self):
+        # Called from the GUI thread: the writer object itself lives on its worker thread
+        self.json_writer.stop()
+
+    def on_toc_progress(self, value, label):
+        self.progress_dialog.setLabelText(label)
+        self.progress_dialog.setValue(value)
+
+    def finish_toc_loading(self):
+        self.progress_dialog.canceled.disconnect(self.cancel_toc_loading)
+        self.progress_dialog.close()
+        self.toc_loader = None
+        self.set_actions_enabled(True)
+
+    def on_toc_loaded(self, result):
+        self.toc = result["toc"]
+        self.toc_index = result["toc_index"]
+        self.search_index = result["search_index"]
+        self.he_to_en = result["he_to_en"]
+        self.reading_list = result["reading_list"]
+        self.selected_he_to_en = result["selected_he_to_en"]
+        self.populate_tree()
+        self.finish_toc_loading()
+
+    def on_toc_refreshed(self, result):
+        """Carry selections over to the refreshed toc by stable id and patch only the changed rows."""
+        diff = result["diff"]
+        carry_over_selections(self.toc_index, result["toc_index"], diff["id_map"])
+        self.toc = result["toc"]
+        self.toc_index = result["toc_index"]
+        self.search_index = result["search_index"]
+        self.he_to_en = result["he_to_en"]
+        if self.tree_model.is_filtered():
+            # Filtered rows are rebuilt on every keystroke anyway: just filter the new toc
+            self.populate_tree()
+        else:
+            self.tree_model.update_toc(self.toc_index, diff["id_map"])
+        self.finish_toc_loading()
+        if TRACE:
+            logger.debug(f"Added: {diff['added']}")
+            logger.debug(f"Removed: {diff['removed']}")
+            logger.debug(f"Renamed: {diff['renamed']}")
+        QMessageBox.information(
+            self, "רענון הושלם",
+            f"נוספו: {len(diff['added'])}\nהוסרו: {len(diff['removed'])}\nשונה שמם: {len(diff['renamed'])}"
+        )
+
+    def on_toc_failed(self, message):
+        refreshing = self.toc_loader.old_index is not None
+        self.finish_toc_loading()
+        QMessageBox.warning(self, "שגיאה", f"שגיאה בשאיבת נתונים: {message}")
+        if refreshing:
+            return  # Keep showing the toc we already have
+        self.toc = []
+        self.toc_index = TocIndex([])
+        self.search_index = TitleSearchIndex(self.toc_index)
+        self.he_to_en = {}
+
+    def on_toc_cancelled(self):
+        self.finish_toc_loading()
+
+    def set_actions_enabled(self, enabled):
+        for button in (self.save_button, self.save_as_button, self.load_button, self.json_button, self.clear_button, self.refresh_button):
+            button.setEnabled(enabled)
     
     def setup_ui(self):
         logger.debug("Setting up UI")
         layout = QVBoxLayout()
+
+        # Search box: filters the tree as the user types
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("חיפוש ספר או קטגוריה (עברית או אנגלית)...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.apply_filter)
+        layout.addWidget(self.search_box)
         
         # Tree widget for hierarchical display of books/categories
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabel("בחירת ספרים וקטגוריות")
-        self.tree.itemChanged.connect(self.update_selection)
+        self.tree_model = TocModel(self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self.show_tree_menu)
         self.populate_tree()
         layout.addWidget(self.tree)
         
@@ -152,6 +701,11 @@ class BookSelectionTab(QWidget):
         self.clear_button.clicked.connect(self.clear_selection)
         layout.addWidget(self.clear_button)
         
+        # Refresh toc button
+        self.refresh_button = QPushButton("רענן רשימת ספרים מ-Sefaria")
+        self.refresh_button.clicked.connect(self.refresh_toc)
+        layout.addWidget(self.refresh_button)
+
         # Exit button
         self.exit_button = QPushButton("יציאה")
         self.exit_button.clicked.connect(QApplication.quit)
@@ -162,108 +716,80 @@ class BookSelectionTab(QWidget):
         logger.debug("UI setup completed")
 
     def populate_tree(self):
-        """Populate tree with toc items, showing only Hebrew titles/categories."""
-        logger.debug("Populating tree")
-        self.tree.clear()
-        for item in self.toc:
-            self.add_tree_item(item, self.tree.invisibleRootItem())
-        logger.debug("Tree population completed")
-
-    def add_tree_item(self, item, parent):
-        """Recursively add items to tree with Hebrew titles/categories."""
-        display_text = item.get("heTitle", item.get("heCategory", ""))
-        if not display_text:
-            logger.debug("Skipping item with no display text")
+        """Show the current toc in the tree view; rows are created by the model as they are expanded."""
+        start_time = time.perf_counter()
+        self.tree_model.set_toc(self.toc_index)
+        log_timing("populate_tree", start_time, items=len(self.toc_index))
+        if self.search_box.text().strip():
+            self.apply_filter(self.search_box.text())
+
+    def apply_filter(self, text):
+        """Show only items whose Hebrew or English title contains text, with their categories; expand small result sets."""
+        start_time = time.perf_counter()
+        if not text.strip():
+            self.tree_model.set_filter(None, None)
+            log_timing("filter", start_time, matches=None)
             return
-        tree_item = QTreeWidgetItem(parent)
-        tree_item.setText(0, display_text)
-        tree_item.setFlags(tree_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-        tree_item.setCheckState(0, Qt.CheckState.Checked if item.get("selected", False) else Qt.CheckState.Unchecked)
-        tree_item.setData(0, Qt.ItemDataRole.UserRole, item)
-        logger.debug(f"Added tree item: {display_text}, selected={item.get('selected', False)}")
-        
-        # Recursively add sub-items
-        for sub_item in item.get("contents", []):
-            self.add_tree_item(sub_item, tree_item)
-
-    def update_selection(self, item, column):
-        """Update selected state of item in self.toc without affecting sub-items."""
-        item_data = item.data(0, Qt.ItemDataRole.UserRole)
-        if item_data:
-            he_title = item_data.get("heTitle", item_data.get("heCategory", ""))
-            selected = item.checkState(0) == Qt.CheckState.Checked
-            logger.debug(f"Updating selection for item: {he_title}, selected={selected}")
-            # Update the corresponding item in self.toc
-            def update_toc_selection(items, target_he_title, target_selected):
-                for toc_item in items:
-                    toc_he_title = toc_item.get("heTitle", toc_item.get("heCategory", ""))
-                    if toc_he_title == target_he_title:
-                        toc_item["selected"] = target_selected
-                        logger.debug(f"Updated toc item: {toc_he_title}, selected={target_selected}")
-                        return True
-                    if update_toc_selection(toc_item.get("contents", []), target_he_title, target_selected):
-                        return True
-                return False
-            update_toc_selection(self.toc, he_title, selected)
-
-    def get_category_path(self, item, toc, path=None):
-        """Recursively find the category path for an item in the TOC."""
-        if path is None:
-            path = []
-        for toc_item in toc:
-            he_title = toc_item.get("heTitle", toc_item.get("heCategory", ""))
-            if he_title == item.get("heTitle", item.get("heCategory", "")):
-                # Found the item, return the current path
-                return path + [he_title]
-            # Recursively search in sub-items
-            sub_path = self.get_category_path(item, toc_item.get("contents", []), path + [he_title])
-            if sub_path:
-                return sub_path
-        return None
+        matches = self.search_index.search(text)
+        self.tree_model.set_filter(self.search_index.visible_ids(matches), matches)
+        if len(matches) <= MAX_EXPANDED_MATCHES:
+            ancestor_ids = self.search_index.visible_ids(self.toc_index.parent[node_id] for node_id in matches)
+            for node_id in ancestor_ids:
+                self.tree.expand(self.tree_model.index_for(node_id))
+        else:
+            self.tree.expandToDepth(0)
+        log_timing("filter", start_time, matches=len(matches))
+
+    def show_tree_menu(self, pos):
+        """Context menu for categories: check all books in the category or clear everything under it."""
+        index = self.tree.indexAt(pos)
+        if not index.isValid() or not self.tree_model.hasChildren(index):
+            return
+        node_id = self.tree_model.data(index, TocModel.NodeIdRole)
+        menu = QMenu(self)
+        check_all = menu.addAction("סמן את כל הספרים בקטגוריה")
+        clear_all = menu.addAction("נקה את כל הבחירות בקטגוריה")
+        action = menu.exec(self.tree.viewport().mapToGlobal(pos))
+        if action == check_all:
+            self.set_category_selected(node_id, True)
+        elif action == clear_all:
+            self.set_category_selected(node_id, False)
+
+    def set_category_selected(self, node_id, selected):
+        """Bulk toggle: check all books below node_id, or clear every selection below it."""
+        changed = self.toc_index.set_descendants_selected(node_id, selected, books_only=selected)
+        logger.debug(f"Set selected={selected} on {len(changed)} items under {node_id}")
+        self.tree_model.refresh_check_states()
+
+    def collect_selections(self):
+        """Rebuild reading_list and selected_he_to_en from the selected items in the toc, including parent categories."""
+        start_time = time.perf_counter()
+        self.reading_list, self.selected_he_to_en = collect_reading_list(self.toc_index)
+        log_timing("collect_selections", start_time, selected=len(self.reading_list))
+        if TRACE:
+            logger.debug(f"Collected reading_list: {self.reading_list}")
+            logger.debug(f"Collected selected_he_to_en: {self.selected_he_to_en}")
+
+    def write_selection(self, file_name, success_message, error_message):
+        """Queue the current selection for writing in the background; the outcome is reported when it is on disk."""
+        self.pending_save_messages[file_name] = (success_message, error_message)
+        self.json_writer.save(file_name, {"reading_list": self.reading_list, "he_to_en": self.selected_he_to_en})
+
+    def on_selection_saved(self, file_name):
+        messages = self.pending_save_messages.pop(file_name, None)
+        if messages:
+            QMessageBox.information(self, "הצלחה", messages[0])
+
+    def on_selection_save_failed(self, file_name, message):
+        messages = self.pending_save_messages.pop(file_name, None)
+        if messages:
+            QMessageBox.warning(self, "שגיאה", f"{messages[1]}: {message}")
 
     def save_selection(self):
         """Save only selected books/categories to reading_list and book_selection.json, including parent categories."""
         logger.debug("Starting save_selection")
-        self.reading_list = []
-        self.selected_he_to_en = {}  # Only include mappings for selected items
-        unique_items = set()  # To avoid duplicates
-        def collect_selections(items):
-            for item in items:
-                if item.get("selected", False):
-                    he_title = item.get("heTitle", item.get("heCategory", ""))
-                    en_title = item.get("title", item.get("category", ""))
-                    if he_title and en_title:
-                        # Get the category path for this item
-                        categories = self.get_category_path(item, self.toc)
-                        if categories:
-                            # Remove the item itself from categories (only include parent categories)
-                            if categories[-1] == he_title:
-                                categories = categories[:-1]
-                            item_dict = {
-                                "he_title": he_title,
-                                "en_title": en_title,
-                                "categories": categories
-                            }
-                            if (he_title, en_title) not in unique_items:
-                                unique_items.add((he_title, en_title))
-                                self.reading_list.append(item_dict)
-                                self.selected_he_to_en[he_title] = en_title
-                                logger.debug(f"Added to reading_list: {item_dict}")
-                            else:
-                                logger.debug(f"Skipped duplicate: ({he_title}, {en_title})")
-                collect_selections(item.get("contents", []))
-        
-        collect_selections(self.toc)
-        logger.debug(f"Collected reading_list: {self.reading_list}")
-        logger.debug(f"Collected selected_he_to_en: {self.selected_he_to_en}")
-        try:
-            with open("book_selection.json", "w", encoding="utf-8") as f:
-                json.dump({"reading_list": self.reading_list, "he_to_en": self.selected_he_to_en}, f, ensure_ascii=False, indent=2)
-                logger.debug("Successfully wrote to book_selection.json")
-            QMessageBox.information(self, "הצלחה", "רשימת הספרים והקטגוריות עודכנה בהצלחה!")
-        except Exception as e:
-            logger.error(f"Error saving JSON: {str(e)}")
-            QMessageBox.warning(self, "שגיאה", f"שגיאה בשמירת הקובץ: {str(e)}")
+        self.collect_selections()
+        self.write_selection("book_selection.json", "רשימת הספרים והקטגוריות עודכנה בהצלחה!", "שגיאה בשמירת הקובץ")
         logger.debug("Completed save_selection")
 
     def save_selection_as(self):
@@ -273,46 +799,8 @@ class BookSelectionTab(QWidget):
         if not file_name:
             logger.debug("Save as cancelled by user")
             return
-        self.reading_list = []
-        self.selected_he_to_en = {}  # Only include mappings for selected items
-        unique_items = set()  # To avoid duplicates
-        def collect_selections(items):
-            for item in items:
-                if item.get("selected", False):
-                    he_title = item.get("heTitle", item.get("heCategory", ""))
-                    en_title = item.get("title", item.get("category", ""))
-                    if he_title and en_title:
-                        # Get the category path for this item
-                        categories = self.get_category_path(item, self.toc)
-                        if categories:
-                            # Remove the item itself from categories (only include parent categories)
-                            if categories[-1] == he_title:
-                                categories = categories[:-1]
-                            item_dict = {
-                                "he_title": he_title,
-                                "en_title": en_title,
-                                "categories": categories
-                            }
-                            if (he_title, en_title) not in unique_items:
-                                unique_items.add((he_title, en_title))
-                                self.reading_list.append(item_dict)
-                                self.selected_he_to_en[he_title] = en_title
-                                logger.debug(f"Added to reading_list: {item_dict}")
-                            else:
-                                logger.debug(f"Skipped duplicate: ({he_title}, {en_title})")
-                collect_selections(item.get("contents", []))
-        
-        collect_selections(self.toc)
-        logger.debug(f"Collected reading_list: {self.reading_list}")
-        logger.debug(f"Collected selected_he_to_en: {self.selected_he_to_en}")
-        try:
-            with open(file_name, "w", encoding="utf-8") as f:
-                json.dump({"reading_list": self.reading_list, "he_to_en": self.selected_he_to_en}, f, ensure_ascii=False, indent=2)
-                logger.debug(f"Successfully wrote to {file_name}")
-            QMessageBox.information(self, "הצלחה", f"רשימת הספרים והקטגוריות נשמרה ב-{file_name}!")
-        except Exception as e:
-            logger.error(f"Error saving JSON: {str(e)}")
-            QMessageBox.warning(self, "שגיאה", f"שגיאה בשמירת הקובץ: {str(e)}")
+        self.collect_selections()
+        self.write_selection(file_name, f"רשימת הספרים והקטגוריות נשמרה ב-{file_name}!", "שגיאה בשמירת הקובץ")
         logger.debug("Completed save_selection_as")
 
     def load_selection(self):
@@ -327,17 +815,12 @@ class BookSelectionTab(QWidget):
                 data = json.load(f)
                 self.reading_list = data.get("reading_list", [])
                 self.selected_he_to_en = data.get("he_to_en", {})
-                logger.debug(f"Loaded JSON: reading_list={self.reading_list}, he_to_en={self.selected_he_to_en}")
+                if TRACE:
+                    logger.debug(f"Loaded JSON: reading_list={self.reading_list}, he_to_en={self.selected_he_to_en}")
                 # Update toc with loaded selections
-                def mark_selections(items):
-                    for item in items:
-                        he_title = item.get("heTitle", item.get("heCategory", ""))
-                        item["selected"] = he_title in self.selected_he_to_en
-                        logger.debug(f"Updated item: {he_title}, selected={item['selected']}")
-                        mark_selections(item.get("contents", []))
-                mark_selections(self.toc)
+                mark_selected(self.toc_index, self.selected_he_to_en)
                 # Refresh tree to reflect loaded selections
-                self.populate_tree()
+                self.tree_model.refresh_check_states()
                 QMessageBox.information(self, "הצלחה", f"רשימת הספרים והקטגוריות נטענה מ-{file_name}!")
         except Exception as e:
             logger.error(f"Error loading JSON: {str(e)}")
@@ -376,24 +859,13 @@ class BookSelectionTab(QWidget):
         self.selected_he_to_en = {}
         
         # Reset selected state in TOC
-        def reset_selections(items):
-            for item in items:
-                item["selected"] = False
-                reset_selections(item.get("contents", []))
-        reset_selections(self.toc)
+        mark_selected(self.toc_index, self.selected_he_to_en)
         
         # Refresh tree to reflect cleared selections
-        self.populate_tree()
+        self.tree_model.refresh_check_states()
         
         # Save empty selection to JSON
-        try:
-            with open("book_selection.json", "w", encoding="utf-8") as f:
-                json.dump({"reading_list": self.reading_list, "he_to_en": self.selected_he_to_en}, f, ensure_ascii=False, indent=2)
-                logger.debug("Successfully cleared and saved to book_selection.json")
-            QMessageBox.information(self, "הצלחה", "רשימת הספרים והקטגוריות נוקתה בהצלחה!")
-        except Exception as e:
-            logger.error(f"Error saving cleared JSON: {str(e)}")
-            QMessageBox.warning(self, "שגיאה", f"שגיאה בניקוי הרשימה: {str(e)}")
+        self.write_selection("book_selection.json", "רשימת הספרים והקטגוריות נוקתה בהצלחה!", "שגיאה בניקוי הרשימה")
         logger.debug("Completed clear_selection")
 
 class MainWindow(QMainWindow):
@@ -404,9 +876,21 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.book_selection_tab)
         self.resize(600, 400)
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Select books and categories from Sefaria's table of contents.")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="log level (default: SEFARIA_LOG_LEVEL or INFO)")
+    parser.add_argument("--trace", action="store_true", default=None,
+                        help="log every item touched while loading, marking and saving (implies DEBUG; or SEFARIA_TRACE=1)")
+    # Anything else (e.g. -platform offscreen) is passed on to Qt
+    return parser.parse_known_args(argv)
+
+
 if __name__ == "__main__":
+    args, qt_args = parse_args(sys.argv[1:])
+    configure_logging(args.log_level, args.trace)
     logger.debug("Starting application")
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     window = MainWindow()
     window.show()
     logger.debug("Main window shown")
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import tempfile
+from json_stream import basic_parse, build_value, skip_value
+
+MODERN_KEYWORDS = ["modern", "contemporary", "21st-century", "20th-century"]
+
+# Bump whenever the entry layout or the relevance rules in collect_commentary_entries change
+INDEX_SCHEMA_VERSION = 1
+DEFAULT_INDEX_CACHE_DIR = os.environ.get(
+    "SEFARIA_INDEX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sefaria_study_app", "commentary_index")
+)
+_STREAMED_FIELDS = {"categories", "dependence", "base_text_titles", "heTitle", "title", "enShortDesc"}
+_ENTRY_FIELDS = ["commentator", "title", "path", "type", "base_text_titles", "categories", "blockers"]
+
+
+def collect_commentary_entries(index_data):
+    """Walk the TOC once and return every non-modern commentary/targum node, in TOC order."""
+    entries = []
+
+    def search_contents(contents, current_path, blockers):
+        for item in contents:
+            categories = item.get("categories", [])
+            dependence = item.get("dependence", "")
+            base_text_titles = item.get("base_text_titles", [])
+            he_title = item.get("heTitle", "")
+            en_title = item.get("title", "")
+            en_short_desc = item.get("enShortDesc", "").lower()
+
+            # Skip modern commentaries
+            if any(keyword in en_short_desc for keyword in MODERN_KEYWORDS):
+                continue
+
+            child_blockers = blockers
+            if "Commentary" in categories or dependence == "Commentary" or "Targum" in categories:
+                entry = {
+                    "id": len(entries),
+                    "commentator": he_title or en_title,
+                    "title": en_title or he_title,
+                    "path": current_path + [en_title or he_title],
+                    "type": "Targum" if "Targum" in categories else "Commentary",
+                    "base_text_titles": base_text_titles,
+                    "categories": categories,
+                    # Unnamed commentary nodes hide their subtree from the titles they are relevant to
+                    "blockers": blockers,
+                }
+                entries.append(entry)
+                if not entry["commentator"]:
+                    child_blockers = blockers + (entry["id"],)
+
+            # Recursively search nested contents
+            if "contents" in item:
+                search_contents(item["contents"], current_path + [en_title or he_title], child_blockers)
+
+    search_contents(index_data, [], ())
+    return entries
+
+
+def _is_modern(en_short_desc):
+    return any(keyword in en_short_desc.lower() for keyword in MODERN_KEYWORDS)
+
+
+def _compact_item(item):
+    """Reduce a TOC node to what collect_commentary_entries needs, or None if it cannot contribute."""
+    if _is_modern(item.pop("enShortDesc", "")):
+        return None
+    categories = item.get("categories", [])
+    if "Commentary" in categories or item.get("dependence", "") == "Commentary" or "Targum" in categories:
+        return item
+    if not item.get("contents"):
+        return None
+    # Non-commentary nodes only contribute a path segment to their descendants
+    return {"title": item.get("title", "") or item.get("heTitle", ""), "contents": item["contents"]}
+
+
+def _stream_items(events):
+    items = []
+    for event, value in events:
+        if event == "end_array":
+            return items
+        if event != "start_map":
+            skip_value(event, events)
+            continue
+        item = {}
+        for event, value in events:
+            if event == "end_map":
+                break
+            key = value
+            event, value = next(events)
+            if key == "contents" and event == "start_array":
+                item["contents"] = _stream_items(events)
+            elif key in _STREAMED_FIELDS:
+                item[key] = build_value(event, value, events)
+            else:
+                skip_value(event, events)
+        item = _compact_item(item)
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def stream_compact_toc(f):
+    """
+    Parse a TOC JSON file (opened in binary mode) event by event, keeping only the fields
+    collect_commentary_entries reads and dropping every node as soon as it is known not to matter.
+    collect_commentary_entries(stream_compact_toc(f)) equals collect_commentary_entries(json.load(f)).
+    """
+    events = iter(basic_parse(f))
+    event, _ = next(events)
+    if event != "start_array":
+        raise ValueError("Expected the TOC to be a JSON array")
+    return _stream_items(events)
+
+
+def add_to_shadow_tree(shadow_trees, entry):
+    """Insert a commentary entry into a commentator -> nested path dict shadow tree."""
+    current_node = shadow_trees.setdefault(entry["commentator"], {})
+    for segment in entry["path"]:
+        if segment not in current_node:
+            current_node[segment] = {}
+        current_node = current_node[segment]
+    current_node["title"] = entry["title"]
+    current_node["path"] = list(entry["path"])
+    current_node["type"] = entry["type"]
+
+
+class CommentaryIndex:
+    """
+    Inverted index over the commentary/targum nodes of a Sefaria TOC.
+    by_base_text maps a base text title to the nodes that comment on it alone,
+    by_category maps each category string to the nodes listing it and by_path maps a node's path to the node,
+    so finding the commentaries of a title is a dictionary hit instead of a walk over the whole TOC.
+    """
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_base_text = {}
+        self.by_category = {}
+        self.by_path = {}
+        for entry in entries:
+            if len(entry["base_text_titles"]) == 1:
+                self.by_base_text.setdefault(entry["base_text_titles"][0], []).append(entry["id"])
+            for cat in dict.fromkeys(entry["categories"]):
+                self.by_category.setdefault(cat, []).append(entry["id"])
+            self.by_path.setdefault(tuple(entry["path"]), []).append(entry["id"])
+        self._relevant_cache = {}
+
+    @classmethod
+    def from_toc(cls, index_data):
+        return cls(collect_commentary_entries(index_data))
+
+    def base_text_titles(self):
+        """Every base text title referenced by a commentary node, in TOC order."""
+        titles = {}
+        for entry in self.entries:
+            for title in entry["base_text_titles"]:
+                titles[title] = True
+        return list(titles)
+
+    def _matching_ids(self, title):
+        # A node is relevant if it comments on title alone or if title occurs in one of its categories
+        ids = set(self.by_base_text.get(title, []))
+        for cat, cat_ids in self.by_category.items():
+            if title in cat:
+                ids.update(cat_ids)
+        return ids
+
+    def relevant_ids(self, title):
+        """Ids of the named nodes that belong in title's shadow trees, in TOC order."""
+        if title not in self._relevant_cache:
+            matching = self._matching_ids(title)
+            self._relevant_cache[title] = [
+                entry_id for entry_id in sorted(matching)
+                if self.entries[entry_id]["commentator"]
+                and not any(blocker in matching for blocker in self.entries[entry_id]["blockers"])
+            ]
+        return self._relevant_cache[title]
+
+    def commentaries_for(self, title):
+        return [self.entries[entry_id] for entry_id in self.relevant_ids(title)]
+
+    def shadow_trees_for(self, title):
+        shadow_trees = {}
+        for entry in self.commentaries_for(title):
+            add_to_shadow_tree(shadow_trees, entry)
+        return shadow_trees
+
+    def search(self, title, search_path):
+        """Same results as search_shadow_trees(shadow_trees_for(title), search_path), without building the trees."""
+        relevant = self.relevant_ids(title)
+        at_path = set(self.by_path.get(tuple(search_path), [])) & set(relevant)
+        if not at_path:
+            return []
+        matches = {}
+        for entry_id in relevant:
+            entry = self.entries[entry_id]
+            if entry["commentator"] not in matches:
+                matches[entry["commentator"]] = None
+            if entry_id in at_path:
+                matches[entry["commentator"]] = entry
+        return [
+            {
+                "מפרש_או_תרגום": commentator,
+                "כותר": entry["title"],
+                "סוג": entry["type"],
+                "מסלול": list(entry["path"])
+            }
+            for commentator, entry in matches.items() if entry is not None
+        ]
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(index_file, cache_dir):
+    key = hashlib.sha256(os.path.abspath(index_file).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{key}.jsonl")
+
+
+def _read_index_cache(cache_path, stat, index_file):
+    """Return (entries, refreshed_sha256) if the cache matches the source file, else (None, None).
+    refreshed_sha256 is set when the content matched by hash under a new mtime."""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("schema") != INDEX_SCHEMA_VERSION or header.get("size") != stat.st_size:
+                return None, None
+            refreshed_sha256 = None
+            if header.get("mtime_ns") != stat.st_mtime_ns:
+                # Touched but possibly unchanged: fall back to comparing content hashes
+                if header.get("sha256") != _file_sha256(index_file):
+                    return None, None
+                refreshed_sha256 = header["sha256"]
+            entries = []
+            for entry_id, line in enumerate(f):
+                entry = dict(zip(_ENTRY_FIELDS, json.loads(line)))
+                entry["id"] = entry_id
+                entry["blockers"] = tuple(entry["blockers"])
+                entries.append(entry)
+    except (OSError, ValueError):
+        return None, None
+    if len(entries) != header.get("count"):
+        return None, None
+    return entries, refreshed_sha256
+
+
+def _write_index_cache(cache_path, entries, stat, sha256):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    header = {
+        "schema": INDEX_SCHEMA_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "count": len(entries),
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for entry in entries:
+                f.write(json.dumps([entry[field] for field in _ENTRY_FIELDS], ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_commentary_entries(index_file, streaming=False):
+    if streaming:
+        with open(index_file, "rb") as f:
+            return collect_commentary_entries(stream_compact_toc(f))
+    with open(index_file, "r", encoding="utf-8") as f:
+        return collect_commentary_entries(json.load(f))
+
+
+def load_commentary_index(index_file, use_cache=True, cache_dir=DEFAULT_INDEX_CACHE_DIR, streaming=False):
+    """
+    Build the CommentaryIndex for a TOC file, reusing an on-disk cache keyed by the file's
+    size/mtime and content hash plus INDEX_SCHEMA_VERSION. Returns (index, source) where
+    source is "cache" or "built". streaming=True parses the file incrementally to cap peak memory.
+    """
+    if not use_cache:
+        return CommentaryIndex(read_commentary_entries(index_file, streaming)), "built"
+    stat = os.stat(index_file)
+    cache_path = _cache_path(index_file, cache_dir)
+    entries, refreshed_sha256 = _read_index_cache(cache_path, stat, index_file)
+    if entries is not None:
+        if refreshed_sha256:
+            # Same content under a new mtime: rewrite the header so the next run skips hashing
+            try:
+                _write_index_cache(cache_path, entries, stat, refreshed_sha256)
+            except OSError:
+                pass
+        return CommentaryIndex(entries), "cache"
+    entries = read_commentary_entries(index_file, streaming)
+    try:
+        _write_index_cache(cache_path, entries, stat, _file_sha256(index_file))
+    except OSError:
+        pass
+    return CommentaryIndex(entries), "built"
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SEFARIA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sefaria_study_app", "http")
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("SEFARIA_CACHE_MAX_MB", "512")) * 1024 * 1024)
+DEFAULT_TTL = float(os.environ.get("SEFARIA_CACHE_TTL", "0"))
+
+# Headers that describe the stored (already decoded) body and must not be replayed as-is
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+class HTTPCache:
+    """
+    On-disk cache of GET responses keyed by URL, with LRU eviction by total size.
+    Each entry is one file: a JSON metadata line (url, validators, headers) followed by the body.
+    Entries are revalidated with If-None-Match / If-Modified-Since; a TTL > 0 additionally serves
+    entries younger than the TTL without contacting the server.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith(".cache"):
+                try:
+                    self._sizes[name] = os.path.getsize(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+        self.total_bytes = sum(self._sizes.values())
+
+    def _file_name(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest() + ".cache"
+
+    def path_for(self, url):
+        return os.path.join(self.cache_dir, self._file_name(url))
+
+    def lookup(self, url):
+        """Return the metadata dict for url, or None if it is not cached."""
+        try:
+            with open(self.path_for(url), "rb") as f:
+                meta = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return meta
+
+    def is_fresh(self, meta):
+        return self.ttl > 0 and time.time() - meta.get("stored_at", 0) < self.ttl
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def open_body(self, url):
+        """Open the cached body of url positioned after the metadata line, marking it recently used."""
+        f = open(self.path_for(url), "rb")
+        f.readline()
+        try:
+            os.utime(f.name)
+        except OSError:
+            pass
+        return f
+
+    def is_cacheable(self, headers):
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return False
+        return bool(headers.get("ETag") or headers.get("Last-Modified") or self.ttl > 0)
+
+    def open_writer(self, url, headers):
+        """Start writing a new entry for url; call write() per chunk, then commit() or abort()."""
+        return _EntryWriter(self, url, headers)
+
+    def store(self, url, headers, chunks):
+        """Write the body chunks for url to the cache atomically and return the new metadata."""
+        writer = self.open_writer(url, headers)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def _committed(self, url, size):
+        with self._lock:
+            name = self._file_name(url)
+            self.total_bytes += size - self._sizes.get(name, 0)
+            self._sizes[name] = size
+            self._evict(keep=name)
+        logger.debug(f"Cached {url} ({size} bytes, total {self.total_bytes} bytes)")
+
+    def refresh(self, url, meta, headers):
+        """Update an entry after a 304 response, rewriting it only if its metadata changed."""
+        new_headers = CaseInsensitiveDict(meta["headers"])
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires"):
+            if headers.get(name):
+                new_headers[name] = headers[name]
+        unchanged = new_headers.get("ETag") == meta.get("etag") and new_headers.get("Last-Modified") == meta.get("last_modified")
+        if unchanged and self.ttl <= 0:
+            try:
+                os.utime(self.path_for(url))
+            except OSError:
+                pass
+            return meta
+        with self.open_body(url) as body:
+            return self.store(url, new_headers, iter(lambda: body.read(64 * 1024), b""))
+
+    def _evict(self, keep=None):
+        if self.total_bytes <= self.max_bytes:
+            return
+        entries = []
+        for name in self._sizes:
+            if name == keep:
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name))
+            except OSError:
+                entries.append((0, name))
+        for _, name in sorted(entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            self.total_bytes -= self._sizes.pop(name)
+            logger.debug(f"Evicted cache entry {name}")
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._sizes):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            self._sizes = {}
+            self.total_bytes = 0
+
+
+class _EntryWriter:
+    """Writes one cache entry to a temp file and atomically moves it into place on commit."""
+    def __init__(self, cache, url, headers):
+        self.cache = cache
+        self.url = url
+        self.meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "headers": {k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS},
+            "stored_at": time.time(),
+        }
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix=".tmp")
+        self.file = os.fdopen(fd, "wb")
+        self.file.write(json.dumps(self.meta, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def write(self, chunk):
+        if chunk:
+            self.file.write(chunk)
+
+    def commit(self):
+        try:
+            self.file.close()
+            size = os.path.getsize(self.tmp_path)
+            os.replace(self.tmp_path, self.cache.path_for(self.url))
+        except BaseException:
+            self.abort()
+            raise
+        self.cache._committed(self.url, size)
+        return self.meta
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class _TeeReader:
+    """File-like wrapper over a urllib3 response that copies the decoded body into the cache as it is read."""
+    def __init__(self, raw, writer):
+        self.raw = raw
+        self.writer = writer
+
+    def read(self, amt=None, **kwargs):
+        chunk = self.raw.read(amt, decode_content=True)
+        self._tee(chunk)
+        return chunk
+
+    def stream(self, amt=2 ** 16, decode_content=True):
+        # requests.iter_content uses this when present and turns urllib3 errors raised here into
+        # requests exceptions, as it does for a plain urllib3 response
+        for chunk in self.raw.stream(amt, decode_content=True):
+            self._tee(chunk)
+            yield chunk
+        self._tee(b"")
+
+    def _tee(self, chunk):
+        """Copy chunk into the cache entry; an empty chunk marks the end of the body and commits it."""
+        if self.writer is None:
+            return
+        try:
+            if chunk:
+                self.writer.write(chunk)
+            else:
+                self.writer.commit()
+                self.writer = None
+        except OSError as e:
+            logger.warning(f"Could not cache {self.writer.url}: {e}")
+            self.writer.abort()
+            self.writer = None
+
+    def close(self):
+        # A body that was not read to the end is never committed
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+        self.raw.close()
+
+    def release_conn(self):
+        self.raw.release_conn()
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that serves GET requests through an HTTPCache, revalidating with conditional requests."""
+    def __init__(self, cache, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != "GET":
+            return super().send(request, stream=stream, **kwargs)
+        url = request.url
+        meta = self.cache.lookup(url)
+        if meta and self.cache.is_fresh(meta):
+            return self._cached_response(request, meta, stream, "HIT")
+        if meta:
+            request.headers.update(self.cache.conditional_headers(meta))
+
+        response = super().send(request, stream=True, **kwargs)
+        if response.status_code == 304 and meta:
+            response.close()
+            try:
+                return self._cached_response(request, self.cache.refresh(url, meta, response.headers), stream, "REVALIDATED")
+            except OSError as e:
+                # Another worker evicted the entry during the round trip: fetch the body again unconditionally
+                logger.warning(f"Cached entry for {url} disappeared during revalidation ({e}); fetching it again")
+                for name in self.cache.conditional_headers(meta):
+                    request.headers.pop(name, None)
+                response = super().send(request, stream=True, **kwargs)
+        if response.status_code != 200 or not self.cache.is_cacheable(response.headers):
+            return response
+
+        if stream:
+            # Copy the body to disk while the caller streams it
+            try:
+                response.raw = _TeeReader(response.raw, self.cache.open_writer(url, response.headers))
+            except OSError as e:
+                logger.warning(f"Could not cache {url}: {e}")
+            response.headers["X-Cache"] = "MISS"
+            return response
+        content = response.content
+        try:
+            self.cache.store(url, response.headers, [content])
+        except OSError as e:
+            logger.warning(f"Could not cache {url}: {e}")
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    def _cached_response(self, request, meta, stream, status):
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.headers["X-Cache"] = status
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        body = self.cache.open_body(request.url)
+        if stream:
+            response.raw = body
+        else:
+            with body:
+                response._content = body.read()
+        return response
+
+
+_shared_cache = None
+
+
+def get_http_cache():
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = HTTPCache()
+    return _shared_cache
+
+
+def create_session(pool_maxsize=10, use_cache=True):
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    if use_cache and os.environ.get("SEFARIA_CACHE", "1") != "0":
+        adapter = CachingHTTPAdapter(get_http_cache(), max_retries=retries, pool_maxsize=pool_maxsize)
+    else:
+        adapter = HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    # Plain http only matters for a local SEFARIA_BASE_URL, which gets the same retries and cache
+    session.mount("http://", adapter)
+    return session
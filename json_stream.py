@@ -0,0 +1,197 @@
+import codecs
+import json
+import re
+from json.decoder import scanstring
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?")
+_LITERALS = {"t": ("true", "boolean", True), "f": ("false", "boolean", False), "n": ("null", "null", None)}
+
+
+class ChunkReader:
+    """Binary file-like object over an iterable of byte chunks (e.g. requests' iter_content), for basic_parse."""
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def read(self, size=-1):
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return b""
+            self.buffer = chunk
+        if size is None or size < 0:
+            data = self.buffer + b"".join(self.chunks)
+            self.buffer = b""
+            return data
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def basic_parse(f, buf_size=64 * 1024):
+    """
+    Yield ijson-style (event, value) pairs for the JSON document in binary file f:
+    start_map, map_key, end_map, start_array, end_array, string, number, boolean, null.
+    Uses ijson's C backend when it is installed, otherwise a pure-Python tokenizer; malformed
+    input raises ValueError with either.
+    """
+    if ijson is not None:
+        return _ijson_basic_parse(f, buf_size)
+    return _python_basic_parse(f, buf_size)
+
+
+def _ijson_basic_parse(f, buf_size):
+    try:
+        yield from ijson.basic_parse(f, buf_size=buf_size, use_float=True)
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON: {e}") from e
+
+
+def _python_basic_parse(f, buf_size):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    containers = []
+    # What may come next: "value", "value_or_end" (after "["), "key", "key_or_end" (after "{"),
+    # "colon", "comma_or_end" (after a value in a container) or "done" (after the top-level value)
+    expect = "value"
+
+    def syntax_error(message):
+        return ValueError(f"{message} at {buf[pos:pos + 10]!r}")
+
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos >= len(buf) - 16 and not eof:
+            # Keep a little lookahead in the buffer so short tokens are never split
+            chunk = f.read(buf_size)
+            eof = not chunk
+            buf = buf[pos:] + decoder.decode(chunk, final=eof)
+            pos = 0
+            continue
+        if pos >= len(buf):
+            if expect != "done":
+                raise ValueError("Incomplete JSON document")
+            return
+        char = buf[pos]
+        if expect == "done":
+            raise syntax_error("Extra data after the JSON document")
+        if char in "}]":
+            kind, empty = ("map", "key_or_end") if char == "}" else ("array", "value_or_end")
+            if not containers or containers[-1] != kind or expect not in ("comma_or_end", empty):
+                raise syntax_error(f"Unexpected {char!r}")
+            containers.pop()
+            expect = "comma_or_end" if containers else "done"
+            pos += 1
+            yield f"end_{kind}", None
+        elif char == ",":
+            if expect != "comma_or_end":
+                raise syntax_error("Unexpected ','")
+            expect = "key" if containers[-1] == "map" else "value"
+            pos += 1
+        elif char == ":":
+            if expect != "colon":
+                raise syntax_error("Unexpected ':'")
+            expect = "value"
+            pos += 1
+        elif expect in ("key", "key_or_end"):
+            if char != '"':
+                raise syntax_error("Expected a string key")
+            try:
+                value, end = scanstring(buf, pos + 1)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The string runs past the buffer: read more and retry
+                chunk = f.read(buf_size)
+                eof = not chunk
+                buf = buf[pos:] + decoder.decode(chunk, final=eof)
+                pos = 0
+                continue
+            pos = end
+            expect = "colon"
+            yield "map_key", value
+        elif expect not in ("value", "value_or_end"):
+            raise syntax_error("Expected ',' or the end of the container")
+        elif char == "{":
+            containers.append("map")
+            expect = "key_or_end"
+            pos += 1
+            yield "start_map", None
+        elif char == "[":
+            containers.append("array")
+            expect = "value_or_end"
+            pos += 1
+            yield "start_array", None
+        elif char == '"':
+            try:
+                value, end = scanstring(buf, pos + 1)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(buf_size)
+                eof = not chunk
+                buf = buf[pos:] + decoder.decode(chunk, final=eof)
+                pos = 0
+                continue
+            pos = end
+            expect = "comma_or_end" if containers else "done"
+            yield "string", value
+        elif char in _LITERALS:
+            literal, event, value = _LITERALS[char]
+            if buf[pos:pos + len(literal)] != literal:
+                raise syntax_error("Invalid JSON literal")
+            pos += len(literal)
+            expect = "comma_or_end" if containers else "done"
+            yield event, value
+        else:
+            match = _NUMBER.match(buf, pos)
+            if not match:
+                raise syntax_error("Invalid JSON")
+            if match.end() == len(buf) and not eof:
+                chunk = f.read(buf_size)
+                eof = not chunk
+                buf = buf[pos:] + decoder.decode(chunk, final=eof)
+                pos = 0
+                continue
+            text = match.group()
+            pos = match.end()
+            expect = "comma_or_end" if containers else "done"
+            yield "number", float(text) if match.group(1) or match.group(2) else int(text)
+
+
+def build_value(event, value, events):
+    """Build the Python object whose first event is (event, value), consuming the rest from events."""
+    if event == "start_map":
+        result = {}
+        for event, value in events:
+            if event == "end_map":
+                return result
+            key = value
+            result[key] = build_value(*next(events), events)
+    if event == "start_array":
+        result = []
+        for event, value in events:
+            if event == "end_array":
+                return result
+            result.append(build_value(event, value, events))
+    return value
+
+
+def skip_value(event, events):
+    """Consume the events of the value starting with event without building any objects."""
+    if event not in ("start_map", "start_array"):
+        return
+    depth = 1
+    for event, _ in events:
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                return
@@ -0,0 +1,145 @@
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# How many functions of each phase's cProfile stats go into the JSON report
+TOP_FUNCTIONS = 15
+
+
+class PhaseProfiler:
+    """
+    Records the duration of named phases (time.perf_counter) per title, and optionally a cProfile
+    profile per phase name and the tracemalloc peak of each phase.
+
+    Thread-safe, so batch runs can time phases from their worker threads. cProfile only sees the thread
+    a phase runs in. tracemalloc is process-wide: while phases overlap, a phase's peak includes
+    allocations made by the others, so it is an upper bound.
+    """
+    def __init__(self, cpu=False, memory=False):
+        self.cpu = cpu
+        self.memory = memory
+        self.records = []
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._start_time = time.perf_counter()
+        self._started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name, title=None):
+        record = {"phase": name, "title": title}
+        profile = None
+        if self.cpu:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler; this phase runs unprofiled
+                profile = None
+        if self.memory:
+            with self._lock:
+                if self._active == 0:
+                    tracemalloc.reset_peak()
+                self._active += 1
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start_time, 6)
+            if profile is not None:
+                profile.disable()
+            if self.memory:
+                record["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - start_bytes) / 1024 / 1024, 3)
+            with self._lock:
+                if self.memory:
+                    self._active -= 1
+                if profile is not None:
+                    self._profiles.setdefault(name, []).append(profile)
+                self.records.append(record)
+
+    def record(self, name, title, seconds):
+        """Add a phase timed elsewhere (e.g. a coroutine, which a context manager around it would not time alone)."""
+        with self._lock:
+            self.records.append({"phase": name, "title": title, "seconds": round(seconds, 6)})
+
+    def phase_stats(self):
+        """Per phase name: count, total, min, median, max (and max peak_mb with memory on), in first-seen order."""
+        phases = {}
+        for record in self.records:
+            phases.setdefault(record["phase"], []).append(record)
+        summary = {}
+        for name, records in phases.items():
+            seconds = [record["seconds"] for record in records]
+            summary[name] = {
+                "count": len(records),
+                "total_seconds": round(sum(seconds), 6),
+                "min_seconds": min(seconds),
+                "median_seconds": round(statistics.median(seconds), 6),
+                "max_seconds": max(seconds),
+            }
+            peaks = [record["peak_mb"] for record in records if "peak_mb" in record]
+            if peaks:
+                summary[name]["max_peak_mb"] = max(peaks)
+        return summary
+
+    def _cpu_report(self, report_file):
+        """Dump the merged cProfile stats of each phase next to report_file; returns {phase: {file, top}}."""
+        base = os.path.splitext(report_file)[0]
+        cpu = {}
+        for name, profiles in self._profiles.items():
+            stats = pstats.Stats(profiles[0], stream=io.StringIO())
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats_file = f"{base}_{name}.pstats"
+            stats.dump_stats(stats_file)
+            top = []
+            for (file_name, line, function), (_, calls, total, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda entry: entry[1][3], reverse=True
+            )[:TOP_FUNCTIONS]:
+                top.append({
+                    "function": f"{file_name}:{line}({function})", "calls": calls,
+                    "total_seconds": round(total, 6), "cumulative_seconds": round(cumulative, 6),
+                })
+            cpu[name] = {"file": stats_file, "top": top}
+        return cpu
+
+    def report(self, report_file=None):
+        report = {
+            "python": platform.python_version(),
+            "started": self._started,
+            "total_seconds": round(time.perf_counter() - self._start_time, 6),
+            "cpu_profile": self.cpu,
+            "memory_profile": self.memory,
+            "phases": self.phase_stats(),
+            "records": list(self.records),
+        }
+        if self.memory:
+            report["process_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 3)
+        if self.cpu and report_file is not None:
+            report["cpu"] = self._cpu_report(report_file)
+        return report
+
+    def write(self, report_file):
+        report = self.report(report_file)
+        with open(report_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"Profile report saved to {report_file}")
+        return report
+
+
+def phase(profiler, name, title=None):
+    """profiler.phase(name, title), or a no-op context when profiling is off (profiler is None)."""
+    if profiler is None:
+        return nullcontext({})
+    return profiler.phase(name, title)
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import sys
+
+from sefaria_toc import (
+    TitleSearchIndex, TocIndex, build_he_to_en, collect_reading_list, display_title, english_title, fetch_toc,
+    mark_selected, read_local_toc, write_json_atomic, write_toc_snapshot,
+)
+
+
+class ReadingListEditor:
+    """
+    The BookSelectionTab operations without Qt: load the toc (local file or snapshot, downloaded when
+    missing or older than 14 days), select and unselect items by title or path, and save, load, clear
+    or print the reading list. Reading lists use the same JSON format as the GUI.
+    """
+    def __init__(self, toc_file="sefaria_toc.json", selection_file="book_selection.json", offline=False):
+        self.toc_file = toc_file
+        self.selection_file = selection_file
+        self.toc, self.he_to_en = self._load_toc(offline)
+        self.toc_index = TocIndex(self.toc)
+        self._lookup = None
+        self._search_index = None
+        if os.path.exists(selection_file):
+            self.load(selection_file)
+        else:
+            mark_selected(self.toc_index, {})
+
+    def _load_toc(self, offline):
+        loaded = read_local_toc(self.toc_file, max_age=float("inf")) if offline else read_local_toc(self.toc_file)
+        if loaded is None and offline:
+            raise FileNotFoundError(f"No local TOC at {self.toc_file} (--offline)")
+        if loaded is None:
+            try:
+                toc = fetch_toc()
+            except Exception as e:
+                # Fall back to a stale local toc rather than failing on a server without network access
+                if not os.path.exists(self.toc_file):
+                    raise
+                print(f"Warning: could not download the TOC ({e}); using {self.toc_file}", file=sys.stderr)
+                loaded = read_local_toc(self.toc_file, max_age=float("inf"))
+            else:
+                write_json_atomic(self.toc_file, toc)
+                loaded = toc, None
+        toc, he_to_en = loaded
+        if he_to_en is None:
+            he_to_en = build_he_to_en(toc)
+            try:
+                write_toc_snapshot(toc, self.toc_file, he_to_en)
+            except OSError as e:
+                print(f"Warning: could not save the TOC snapshot: {e}", file=sys.stderr)
+        return toc, he_to_en
+
+    def find(self, query):
+        """
+        Ids of the items query names exactly: a stable id / English path ("Tanakh/Torah/Genesis"), a Hebrew
+        path ("תנ"ך/תורה/בראשית"), or an English or Hebrew title (which may name several items).
+        """
+        if self._lookup is None:
+            self._lookup = {}
+            for node_id, item in self.toc_index.items.items():
+                he_path = "/".join(self.toc_index.category_path(node_id) + [display_title(item)])
+                for key in {node_id, he_path, display_title(item), english_title(item)}:
+                    if key:
+                        self._lookup.setdefault(key, []).append(node_id)
+        return list(self._lookup.get(query.strip("/"), []))
+
+    def search(self, text):
+        """Ids of the items whose Hebrew or English title contains text (see TitleSearchIndex)."""
+        if self._search_index is None:
+            self._search_index = TitleSearchIndex(self.toc_index, self.he_to_en)
+        return self._search_index.search(text)
+
+    def _resolve(self, queries):
+        node_ids = []
+        missing = []
+        for query in queries:
+            found = self.find(query)
+            if not found:
+                missing.append(query)
+            node_ids += found
+        if missing:
+            raise KeyError(f"Not found in the TOC: {', '.join(missing)}")
+        return node_ids
+
+    def select(self, queries, books=False):
+        """Select the named items; with books=True select every book below named categories instead (like the GUI menu)."""
+        changed = []
+        for node_id in self._resolve(queries):
+            if books and self.toc_index.children[node_id]:
+                changed += self.toc_index.set_descendants_selected(node_id, True, books_only=True)
+            elif not self.toc_index.items[node_id].get("selected", False):
+                self.toc_index.set_selected(node_id, True)
+                changed.append(node_id)
+        return changed
+
+    def unselect(self, queries, recursive=False):
+        """Unselect the named items, and with recursive=True everything below them."""
+        changed = []
+        for node_id in self._resolve(queries):
+            if self.toc_index.items[node_id].get("selected", False):
+                self.toc_index.set_selected(node_id, False)
+                changed.append(node_id)
+            if recursive:
+                changed += self.toc_index.set_descendants_selected(node_id, False)
+        return changed
+
+    def clear(self):
+        mark_selected(self.toc_index, {})
+
+    def load(self, file_name):
+        """Select exactly the items named (by Hebrew title) in a reading list file; returns how many are selected."""
+        with open(file_name, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return mark_selected(self.toc_index, data.get("he_to_en", {}))
+
+    def to_json(self):
+        reading_list, he_to_en = collect_reading_list(self.toc_index)
+        return {"reading_list": reading_list, "he_to_en": he_to_en}
+
+    def save(self, file_name=None):
+        """Write the reading list to file_name (default: the selection file); returns how many items it has."""
+        data = self.to_json()
+        write_json_atomic(file_name or self.selection_file, data)
+        return len(data["reading_list"])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Build and edit Sefaria reading lists (book_selection.json) without the GUI.",
+        usage="python reading_list_cli.py [--toc-file F] [--selection-file F] [--offline] <command> ...",
+    )
+    parser.add_argument("--toc-file", default="sefaria_toc.json", help="local Sefaria TOC (downloaded when missing or stale)")
+    parser.add_argument("--selection-file", default="book_selection.json", help="reading list to read and update")
+    parser.add_argument("--offline", action="store_true", help="never download the TOC; use the local file whatever its age")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="print the reading list JSON")
+    select = commands.add_parser("select", help="select books/categories by title or path and save")
+    select.add_argument("items", nargs="+", help="English/Hebrew title, English path (Tanakh/Torah/Genesis) or Hebrew path")
+    select.add_argument("--books", action="store_true", help="select every book below the named categories instead")
+    unselect = commands.add_parser("unselect", help="unselect books/categories by title or path and save")
+    unselect.add_argument("items", nargs="+")
+    unselect.add_argument("--recursive", action="store_true", help="also unselect everything below the named categories")
+    commands.add_parser("clear", help="unselect everything and save")
+    load = commands.add_parser("load", help="replace the selection with the one in FILE and save")
+    load.add_argument("file")
+    save = commands.add_parser("save", help="write the current selection to FILE")
+    save.add_argument("file")
+    find = commands.add_parser("find", help="list items whose Hebrew or English title contains TEXT")
+    find.add_argument("text")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    try:
+        editor = ReadingListEditor(args.toc_file, args.selection_file, offline=args.offline)
+        if args.command == "show":
+            print(json.dumps(editor.to_json(), ensure_ascii=False, indent=2))
+        elif args.command == "find":
+            for node_id in editor.search(args.text):
+                item = editor.toc_index.items[node_id]
+                mark = "*" if item.get("selected", False) else " "
+                print(f"{mark} {node_id}\t{display_title(item)}")
+        elif args.command == "save":
+            print(f"Saved {editor.save(args.file)} items to {args.file}")
+        else:
+            if args.command == "select":
+                changed = editor.select(args.items, books=args.books)
+            elif args.command == "unselect":
+                changed = editor.unselect(args.items, recursive=args.recursive)
+            elif args.command == "clear":
+                editor.clear()
+                changed = None
+            else:
+                editor.load(args.file)
+                changed = None
+            saved = editor.save()
+            if changed is not None:
+                print(f"Updated {len(changed)} items")
+            print(f"Saved {saved} items to {args.selection_file}")
+    except (KeyError, OSError, ValueError) as e:
+        print(f"Error: {e.args[0] if isinstance(e, KeyError) else e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
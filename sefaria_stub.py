@@ -0,0 +1,228 @@
+"""
+Local stand-in for the Sefaria API: replays JSON responses from a fixtures directory, with
+configurable latency, bandwidth, injected 429/5xx errors, truncated bodies and Retry-After headers.
+
+The bundled fixtures/ are synthetic: small hand-written responses in the shape of the real API (a small
+TOC, and index, versions and v3 texts responses for Genesis, Exodus and Berakhot), not
+recordings. Use --record against www.sefaria.org with an empty --fixtures directory to capture real ones.
+
+    python sefaria_stub.py --port 8765 --latency 0.05 --fail-first 1 --retry-after 0
+    SEFARIA_BASE_URL=http://127.0.0.1:8765 python title_info.py Genesis fixtures/api/index.json
+
+A request for /api/v2/raw/index/Genesis is answered from fixtures/api/v2/raw/index/Genesis.json and
+/api/index/ from fixtures/api/index.json. With --record URL, missing fixtures are fetched from URL
+(e.g. https://www.sefaria.org) and saved. GET /_stub/stats returns request and fault counters.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+_CHUNK_SIZE = 16 * 1024
+
+
+class SefariaStub:
+    """
+    The stub server, usable from code: "with SefariaStub(latency=0.1) as stub:" starts it on a free
+    port in a background thread and stub.base_url is what SEFARIA_BASE_URL should be set to.
+
+    latency: seconds before each response; bandwidth: body bytes per second (None: unlimited);
+    fail_first: the first N requests for each path get an injected error; fail_rate: probability of an
+    injected error on any other request (seeded, so runs repeat); fail_statuses: statuses injected, in
+    turn; retry_after: Retry-After value sent with injected 429/503 responses (None: no header);
+    truncate_first: the next N requests for each path get half their body before the connection closes.
+    """
+    def __init__(self, fixtures_dir=DEFAULT_FIXTURES_DIR, host="127.0.0.1", port=0, latency=0.0, bandwidth=None,
+                 fail_first=0, fail_rate=0.0, fail_statuses=(503,), retry_after=None, seed=0, record_from=None,
+                 truncate_first=0):
+        self.fixtures_dir = os.path.abspath(fixtures_dir)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.fail_first = fail_first
+        self.fail_rate = fail_rate
+        self.fail_statuses = tuple(fail_statuses)
+        self.retry_after = retry_after
+        self.truncate_first = truncate_first
+        self.record_from = record_from.rstrip("/") if record_from else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "not_modified": 0, "not_found": 0, "injected": 0, "truncated": 0, "by_path": {}}
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fixture_path(self, url_path):
+        """Fixture file for a request path, or None if the path would leave the fixtures directory."""
+        relative = unquote(url_path).strip("/")
+        path = os.path.normpath(os.path.join(self.fixtures_dir, relative + ".json"))
+        if not path.startswith(self.fixtures_dir + os.sep):
+            return None
+        return path
+
+    def injected_status(self, url_path):
+        """Count the request and return the status of an error to inject for it, or None."""
+        with self._lock:
+            self.stats["requests"] += 1
+            count = self.stats["by_path"].get(url_path, 0)
+            self.stats["by_path"][url_path] = count + 1
+            if count < self.fail_first or (self.fail_rate and self._random.random() < self.fail_rate):
+                status = self.fail_statuses[self.stats["injected"] % len(self.fail_statuses)]
+                self.stats["injected"] += 1
+                return status
+        return None
+
+    def truncated(self, url_path):
+        """Whether this request (already counted by injected_status) gets a truncated body."""
+        with self._lock:
+            count = self.stats["by_path"][url_path] - 1
+            if self.fail_first <= count < self.fail_first + self.truncate_first:
+                self.stats["truncated"] += 1
+                return True
+        return False
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def record(self, url_path, path):
+        """Fetch url_path from record_from and save it as a fixture; returns True if it was saved."""
+        import requests
+
+        response = requests.get(f"{self.record_from}{url_path}", headers={"accept": "application/json"}, timeout=60)
+        if response.status_code != 200:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(response.content)
+        return True
+
+
+def _make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url_path = urlsplit(self.path).path
+            if url_path == "/_stub/stats":
+                with stub._lock:
+                    body = json.dumps(stub.stats).encode("utf-8")
+                return self.send_body(200, body)
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            status = stub.injected_status(url_path)
+            if status is not None:
+                headers = {}
+                if stub.retry_after is not None and status in (429, 503):
+                    headers["Retry-After"] = str(stub.retry_after)
+                return self.send_body(status, json.dumps({"error": f"Injected {status}"}).encode("utf-8"), headers)
+
+            path = stub.fixture_path(url_path)
+            if path is not None and not os.path.exists(path) and stub.record_from:
+                stub.record(url_path, path)
+            if path is None or not os.path.exists(path):
+                stub.count("not_found")
+                return self.send_body(404, json.dumps({"error": f"No fixture for {url_path}"}).encode("utf-8"))
+
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                stub.count("not_modified")
+                return self.send_body(304, b"", {"ETag": etag})
+            stub.count("served")
+            self.send_body(200, body, {"ETag": etag, "Cache-Control": "no-cache"}, truncate=stub.truncated(url_path))
+
+        def send_body(self, status, body, headers=None, truncate=False):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if truncate:
+                # Content-Length promises the whole body; close after half of it
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            if not stub.bandwidth:
+                self.wfile.write(body)
+                return
+            for start in range(0, len(body), _CHUNK_SIZE):
+                chunk = body[start:start + _CHUNK_SIZE]
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                time.sleep(len(chunk) / stub.bandwidth)
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="directory of fixture responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--bandwidth", type=float, help="response body bytes per second")
+    parser.add_argument("--fail-first", type=int, default=0, help="inject an error into the first N requests for each path")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of an injected error on other requests")
+    parser.add_argument("--fail-status", type=int, nargs="+", default=[503], help="statuses to inject, in turn (e.g. 429 503)")
+    parser.add_argument("--retry-after", help="Retry-After header sent with injected 429/503 responses (seconds or HTTP date)")
+    parser.add_argument("--truncate-first", type=int, default=0, help="then send only half the body of the next N requests for each path")
+    parser.add_argument("--seed", type=int, default=0, help="seed for --fail-rate")
+    parser.add_argument("--record", metavar="URL", help="fetch missing fixtures from URL (e.g. https://www.sefaria.org) and save them")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    stub = SefariaStub(
+        args.fixtures, args.host, args.port, latency=args.latency, bandwidth=args.bandwidth,
+        fail_first=args.fail_first, fail_rate=args.fail_rate, fail_statuses=args.fail_status,
+        retry_after=args.retry_after, seed=args.seed, record_from=args.record,
+        truncate_first=args.truncate_first,
+    )
+    print(f"Serving {stub.fixtures_dir} at {stub.base_url}")
+    print(f"export SEFARIA_BASE_URL={stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
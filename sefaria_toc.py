@@ -0,0 +1,397 @@
+import json
+import marshal
+import os
+import tempfile
+import time
+import unicodedata
+from array import array
+
+# SEFARIA_BASE_URL points requests at another server, e.g. the local stub (sefaria_stub.py)
+SEFARIA_BASE_URL = os.environ.get("SEFARIA_BASE_URL", "https://www.sefaria.org").rstrip("/")
+SEFARIA_API_URL = f"{SEFARIA_BASE_URL}/api"
+TOC_URL = f"{SEFARIA_API_URL}/index/"
+# The local toc file is used as is while it is younger than this
+TOC_MAX_AGE = 14 * 24 * 60 * 60  # 14 days in seconds
+
+SNAPSHOT_VERSION = 1
+# Item fields kept in the snapshot: everything the selection window reads
+_SNAPSHOT_FIELDS = ("title", "heTitle", "category", "heCategory")
+
+
+def display_title(item):
+    """Hebrew title of a book or category item."""
+    return item.get("heTitle", item.get("heCategory", ""))
+
+
+def english_title(item):
+    """English title of a book or category item."""
+    return item.get("title", item.get("category", ""))
+
+
+class TocIndex:
+    """
+    Index over the toc built once when it loads: every item gets a stable id (its path of English
+    titles, with a "#n" suffix for repeated siblings), a parent pointer and its child ids, so items
+    can be found and toggled in constant time even when Hebrew titles repeat.
+    Ids are assigned in toc pre-order, which is also the iteration order of items.
+    """
+    def __init__(self, toc):
+        self.toc = toc
+        self.items = {}
+        self.parent = {}
+        self.children = {}
+        self.roots = []
+        self._ids_by_object = {}
+        self._add_items(toc, None, self.roots)
+
+    def _add_items(self, items, parent_id, sibling_ids):
+        # Explicit stack instead of recursion; children are pushed in reverse to keep pre-order
+        stack = [(item, parent_id, sibling_ids) for item in reversed(items)]
+        seen_segments = {}
+        while stack:
+            item, parent_id, sibling_ids = stack.pop()
+            segment = english_title(item) or display_title(item)
+            count = seen_segments.get((parent_id, segment), 0)
+            seen_segments[(parent_id, segment)] = count + 1
+            base_id = segment if parent_id is None else f"{parent_id}/{segment}"
+            node_id = f"{base_id}#{count}" if count else base_id
+            while node_id in self.items:
+                # A title containing "/" produced the same path as another item
+                count += 1
+                node_id = f"{base_id}#{count}"
+            self.items[node_id] = item
+            self.parent[node_id] = parent_id
+            self.children[node_id] = []
+            self._ids_by_object[id(item)] = node_id
+            sibling_ids.append(node_id)
+            for sub_item in reversed(item.get("contents", [])):
+                stack.append((sub_item, node_id, self.children[node_id]))
+
+    def __len__(self):
+        return len(self.items)
+
+    def id_of(self, item):
+        """Stable id of an item dict from this toc, or None."""
+        return self._ids_by_object.get(id(item))
+
+    def category_path(self, node_id):
+        """Hebrew titles of the categories above node_id, outermost first, found through parent pointers."""
+        path = []
+        parent_id = self.parent[node_id]
+        while parent_id is not None:
+            path.append(display_title(self.items[parent_id]))
+            parent_id = self.parent[parent_id]
+        path.reverse()
+        return path
+
+    def set_selected(self, node_id, selected):
+        self.items[node_id]["selected"] = selected
+
+    def descendants(self, node_id):
+        """Ids of every item below node_id, in pre-order."""
+        result = []
+        stack = list(reversed(self.children[node_id]))
+        while stack:
+            child_id = stack.pop()
+            result.append(child_id)
+            stack.extend(reversed(self.children[child_id]))
+        return result
+
+    def set_descendants_selected(self, node_id, selected, books_only=False):
+        """Set "selected" on everything below node_id (only on books, i.e. items without contents, if books_only)."""
+        changed = []
+        for child_id in self.descendants(node_id):
+            item = self.items[child_id]
+            if books_only and item.get("contents"):
+                continue
+            if item.get("selected", False) != selected:
+                item["selected"] = selected
+                changed.append(child_id)
+        return changed
+
+
+def mark_selected(toc_index, selected_he_to_en):
+    """Set "selected" on every toc item whose Hebrew title is in selected_he_to_en; returns how many are selected."""
+    count = 0
+    for item in toc_index.items.values():
+        item["selected"] = selected = display_title(item) in selected_he_to_en
+        count += selected
+    return count
+
+
+def collect_reading_list(toc_index):
+    """
+    Selected items with both Hebrew and English titles, in toc order and without duplicates, as
+    (reading_list, he_to_en). Each reading_list entry has he_title, en_title and its parent categories.
+    """
+    reading_list = []
+    he_to_en = {}
+    unique_items = set()  # To avoid duplicates
+    for node_id, item in toc_index.items.items():
+        if not item.get("selected", False):
+            continue
+        he_title = display_title(item)
+        en_title = english_title(item)
+        if not he_title or not en_title or (he_title, en_title) in unique_items:
+            continue
+        unique_items.add((he_title, en_title))
+        reading_list.append({
+            "he_title": he_title,
+            "en_title": en_title,
+            "categories": toc_index.category_path(node_id)
+        })
+        he_to_en[he_title] = en_title
+    return reading_list, he_to_en
+
+
+def normalize_title(text):
+    """Casefold and drop combining marks (niqqud, cantillation, accents) so searches ignore them."""
+    return "".join(char for char in unicodedata.normalize("NFD", text.casefold()) if not unicodedata.combining(char))
+
+
+class TitleSearchIndex:
+    """
+    Trigram index over every item's Hebrew and English titles (plus the he_to_en English name when it
+    differs), built once per toc so filtering as the user types only looks at candidate items.
+    Queries match anywhere in a title, ignoring case and niqqud.
+    """
+    def __init__(self, toc_index, he_to_en=None):
+        self.toc_index = toc_index
+        self.ids = []
+        self.keys = []
+        self.grams = {}
+        he_to_en = he_to_en or {}
+        for node_id, item in toc_index.items.items():
+            he_title = display_title(item)
+            titles = [he_title, english_title(item), he_to_en.get(he_title, "")]
+            # Newlines keep a query from matching across two titles
+            key = "\n".join(normalize_title(title) for title in titles if title)
+            position = len(self.ids)
+            self.ids.append(node_id)
+            self.keys.append(key)
+            for gram in {key[i:i + 3] for i in range(len(key) - 2)}:
+                self.grams.setdefault(gram, []).append(position)
+
+    def search(self, query):
+        """Ids of the items with a title containing query, in toc pre-order."""
+        query = normalize_title(query.strip())
+        if not query:
+            return []
+        if len(query) < 3:
+            candidates = range(len(self.keys))
+        else:
+            postings = [self.grams.get(query[i:i + 3], []) for i in range(len(query) - 2)]
+            candidates = min(postings, key=len)
+        keys = self.keys
+        return [self.ids[position] for position in candidates if query in keys[position]]
+
+    def visible_ids(self, matches):
+        """The matches plus all their ancestors: what a filtered tree has to show to reach them."""
+        visible = set()
+        parent = self.toc_index.parent
+        for node_id in matches:
+            while node_id is not None and node_id not in visible:
+                visible.add(node_id)
+                node_id = parent[node_id]
+        return visible
+
+
+def diff_toc(old_index, new_index):
+    """
+    Structural diff of two TocIndexes, walking matched parents top-down: children are matched by id
+    segment first, then the leftovers by Hebrew title, which catches English renames. Returns a dict
+    with id_map (old id -> new id of every matched item), added and removed (unmatched new/old ids)
+    and renamed ((old id, new id) pairs whose own Hebrew or English title changed), all in pre-order.
+    """
+    id_map = {}
+    stack = [(None, None)]
+    while stack:
+        old_parent, new_parent = stack.pop()
+        old_ids = old_index.roots if old_parent is None else old_index.children[old_parent]
+        new_ids = new_index.roots if new_parent is None else new_index.children[new_parent]
+        new_id_set = set(new_ids)
+        taken = set()
+        unmatched = []
+        for old_id in old_ids:
+            segment = old_id if old_parent is None else old_id[len(old_parent) + 1:]
+            new_id = segment if new_parent is None else f"{new_parent}/{segment}"
+            if new_id in new_id_set:
+                id_map[old_id] = new_id
+                taken.add(new_id)
+            else:
+                unmatched.append(old_id)
+        if unmatched:
+            by_title = {}
+            for new_id in new_ids:
+                if new_id not in taken:
+                    by_title.setdefault(display_title(new_index.items[new_id]), []).append(new_id)
+            for old_id in unmatched:
+                title = display_title(old_index.items[old_id])
+                if title and by_title.get(title):
+                    id_map[old_id] = by_title[title].pop(0)
+        stack.extend((old_id, id_map[old_id]) for old_id in old_ids if old_id in id_map)
+
+    matched_new_ids = set(id_map.values())
+    return {
+        "id_map": id_map,
+        "added": [new_id for new_id in new_index.items if new_id not in matched_new_ids],
+        "removed": [old_id for old_id in old_index.items if old_id not in id_map],
+        "renamed": [
+            (old_id, id_map[old_id]) for old_id in old_index.items if old_id in id_map and (
+                display_title(old_index.items[old_id]) != display_title(new_index.items[id_map[old_id]])
+                or english_title(old_index.items[old_id]) != english_title(new_index.items[id_map[old_id]])
+            )
+        ],
+    }
+
+
+def carry_over_selections(old_index, new_index, id_map):
+    """Copy "selected" from old items to the new items they map to; everything else starts unselected."""
+    for item in new_index.items.values():
+        item["selected"] = False
+    for old_id, new_id in id_map.items():
+        new_index.items[new_id]["selected"] = old_index.items[old_id].get("selected", False)
+
+
+def _write_atomic(path, write, mode="w"):
+    """Call write(f) on a temp file next to path, then rename it over path, so a crash mid-write
+    leaves the previous file intact instead of a truncated one."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path, data):
+    """Write data as indented JSON to path atomically (temp file + rename)."""
+    _write_atomic(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+
+
+def build_he_to_en(toc):
+    """Hebrew -> English title of every item that has both, in toc pre-order (later items win)."""
+    he_to_en = {}
+    stack = list(reversed(toc))
+    while stack:
+        item = stack.pop()
+        he_title = display_title(item)
+        en_title = english_title(item)
+        if he_title and en_title:
+            he_to_en[he_title] = en_title
+        stack.extend(reversed(item.get("contents", [])))
+    return he_to_en
+
+
+def read_local_toc(toc_file, max_age=TOC_MAX_AGE):
+    """
+    Return (toc, he_to_en) from toc_file if it exists and is younger than max_age seconds, else None.
+    he_to_en comes from the compact snapshot when it matches the file; otherwise the toc is parsed
+    from the JSON and he_to_en is None.
+    """
+    if not os.path.exists(toc_file) or os.path.getmtime(toc_file) <= time.time() - max_age:
+        return None
+    snapshot = load_toc_snapshot(toc_file)
+    if snapshot is not None:
+        return snapshot
+    with open(toc_file, "r", encoding="utf-8") as f:
+        return json.load(f), None
+
+
+def fetch_toc(on_chunk=None):
+    """Download the toc from Sefaria's API, calling on_chunk(received_bytes, total_bytes or 0) after each chunk."""
+    from http_cache import create_session  # Only needed when the local toc is missing or stale
+
+    chunks = []
+    received = 0
+    with create_session().get(TOC_URL, timeout=(10, 30), stream=True) as response:
+        response.raise_for_status()
+        total = int(response.headers.get("Content-Length", 0) or 0)
+        for chunk in response.iter_content(64 * 1024):
+            chunks.append(chunk)
+            received += len(chunk)
+            if on_chunk is not None:
+                on_chunk(received, total)
+    return json.loads(b"".join(chunks))
+
+
+def snapshot_path(toc_file):
+    return os.path.splitext(toc_file)[0] + ".snapshot"
+
+
+def write_toc_snapshot(toc, toc_file, he_to_en=None):
+    """
+    Save a compact snapshot of toc_file next to it: the title fields the selection window uses, as
+    flat pre-order arrays of string-table indices with parent indices, plus the precomputed he_to_en.
+    The snapshot records the JSON file's size and mtime and is ignored once they change.
+    """
+    stat = os.stat(toc_file)
+    strings = []
+    string_ids = {}
+    fields = {field: array("i") for field in _SNAPSHOT_FIELDS}
+    has_contents = bytearray()
+    parents = array("i")
+    stack = [(item, -1) for item in reversed(toc)]
+    while stack:
+        item, parent = stack.pop()
+        node = len(parents)
+        parents.append(parent)
+        has_contents.append("contents" in item)
+        for field, ids in fields.items():
+            value = item.get(field)
+            if value is None:
+                ids.append(-1)
+                continue
+            string_id = string_ids.get(value)
+            if string_id is None:
+                string_id = string_ids[value] = len(strings)
+                strings.append(value)
+            ids.append(string_id)
+        stack.extend((sub_item, node) for sub_item in reversed(item.get("contents", [])))
+    if he_to_en is None:
+        he_to_en = build_he_to_en(toc)
+    snapshot = (
+        SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns, strings, parents.tobytes(), bytes(has_contents),
+        [fields[field].tobytes() for field in _SNAPSHOT_FIELDS], he_to_en,
+    )
+    _write_atomic(snapshot_path(toc_file), lambda f: marshal.dump(snapshot, f), "wb")
+
+
+def load_toc_snapshot(toc_file):
+    """Return (toc, he_to_en) from the snapshot of toc_file, or None if it is missing or out of date."""
+    try:
+        stat = os.stat(toc_file)
+        with open(snapshot_path(toc_file), "rb") as f:
+            snapshot = marshal.load(f)
+        version, size, mtime_ns, strings, parent_bytes, has_contents, field_bytes, he_to_en = snapshot
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != SNAPSHOT_VERSION or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    parents = array("i")
+    parents.frombytes(parent_bytes)
+    columns = []
+    for field, ids_bytes in zip(_SNAPSHOT_FIELDS, field_bytes):
+        ids = array("i")
+        ids.frombytes(ids_bytes)
+        columns.append((field, ids))
+
+    toc = []
+    items = []
+    for node, parent in enumerate(parents):
+        item = {field: strings[ids[node]] for field, ids in columns if ids[node] >= 0}
+        if has_contents[node]:
+            item["contents"] = []
+        items.append(item)
+        (toc if parent < 0 else items[parent]["contents"]).append(item)
+    return toc, he_to_en
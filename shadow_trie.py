@@ -0,0 +1,67 @@
+_PAYLOAD_KEYS = ("title", "path", "type")
+
+
+class ShadowTreeTrie:
+    """
+    All commentators' shadow trees merged into one path trie (segment -> child node), with the
+    commentators found at a path stored on that path's node. Exact-path lookups cost one dict hit
+    per segment and prefix queries only visit the matching subtree, instead of walking every
+    commentator's tree per query.
+    """
+    def __init__(self):
+        # Each node is [children, results]
+        self.root = [{}, []]
+
+    @classmethod
+    def from_shadow_trees(cls, shadow_trees):
+        trie = cls()
+        for commentator, tree in shadow_trees.items():
+            trie.add_tree(commentator, tree)
+        return trie
+
+    def add_tree(self, commentator, tree):
+        """Add one commentator's nested shadow tree."""
+        def add_node(tree_node, trie_node):
+            if "title" in tree_node:
+                trie_node[1].append({
+                    "מפרש_או_תרגום": commentator,
+                    "כותר": tree_node["title"],
+                    "סוג": tree_node["type"],
+                    "מסלול": tree_node["path"]
+                })
+            for segment, child in tree_node.items():
+                if segment in _PAYLOAD_KEYS and not isinstance(child, dict):
+                    continue
+                add_node(child, trie_node[0].setdefault(segment, [{}, []]))
+        add_node(tree, self.root)
+
+    def _find(self, search_path):
+        node = self.root
+        for segment in search_path:
+            node = node[0].get(segment)
+            if node is None:
+                return None
+        return node
+
+    def search(self, search_path):
+        """Results at exactly search_path, in the same order search_shadow_trees returns them."""
+        node = self._find(search_path)
+        return list(node[1]) if node else []
+
+    def search_prefix(self, prefix):
+        """Results at prefix or anywhere below it, in depth-first order."""
+        node = self._find(prefix)
+        if node is None:
+            return []
+        results = []
+        stack = [node]
+        while stack:
+            children, node_results = stack.pop()
+            results.extend(node_results)
+            stack.extend(reversed(list(children.values())))
+        return results
+
+    def search_many(self, search_paths, prefix=False):
+        """Resolve many paths in one call; returns one result list per path, in input order."""
+        lookup = self.search_prefix if prefix else self.search
+        return [lookup(search_path) for search_path in search_paths]
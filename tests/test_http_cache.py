@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_stream
+import title_info
+from http_cache import CachingHTTPAdapter, HTTPCache
+from sefaria_stub import SefariaStub
+
+
+@pytest.fixture
+def stub():
+    with SefariaStub() as stub:
+        yield stub
+
+
+def cached_session(cache):
+    session = requests.Session()
+    session.mount("http://", CachingHTTPAdapter(cache))
+    return session
+
+
+def cache_files(cache):
+    return [name for name in os.listdir(cache.cache_dir) if name.endswith(".cache")]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_miss_then_revalidated(stub, tmp_path, stream):
+    cache = HTTPCache(str(tmp_path))
+    session = cached_session(cache)
+    url = f"{stub.base_url}/api/v2/raw/index/Genesis"
+
+    first = session.get(url, stream=stream)
+    first_body = b"".join(first.iter_content(1024)) if stream else first.content
+    assert first.headers["X-Cache"] == "MISS"
+    assert len(cache_files(cache)) == 1
+
+    second = session.get(url, stream=stream)
+    second_body = b"".join(second.iter_content(1024)) if stream else second.content
+    assert second.headers["X-Cache"] == "REVALIDATED"
+    assert second_body == first_body
+    assert stub.stats["served"] == 1 and stub.stats["not_modified"] == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=10 ** 6)
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.store(f"http://test/{name}", {"ETag": f'"{name}"'}, [b"x" * 1000])
+        os.utime(cache.path_for(f"http://test/{name}"), (1000 + i, 1000 + i))
+    # Reading "a" makes it the most recently used entry
+    cache.open_body("http://test/a").close()
+    # Room for three entries of this size
+    cache.max_bytes = 3 * max(cache._sizes.values()) + 10
+
+    cache.store("http://test/d", {"ETag": '"d"'}, [b"x" * 1000])
+
+    assert cache.lookup("http://test/b") is None
+    for name in ["a", "c", "d"]:
+        assert cache.lookup(f"http://test/{name}") is not None
+    assert cache.total_bytes <= cache.max_bytes
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_truncated_body_falls_back_to_empty(tmp_path, stream):
+    cache = HTTPCache(str(tmp_path))
+    session = cached_session(cache)
+    with SefariaStub(truncate_first=1) as stub:
+        url = f"{stub.base_url}/api/v3/texts/Genesis"
+        parse_stream = title_info.stream_texts_versions if stream else None
+        data, _ = title_info._fetch_json_phase(session, url, "Texts", lambda data: "", parse_stream)
+        assert data == {}
+        assert stub.stats["truncated"] == 1
+        assert cache_files(cache) == []
+
+
+@pytest.mark.parametrize("use_ijson", [True, False])
+def test_full_texts_second_fetch_revalidated(stub, tmp_path, monkeypatch, use_ijson):
+    if not use_ijson:
+        monkeypatch.setattr(json_stream, "ijson", None)
+    monkeypatch.setattr(title_info, "SEFARIA_API_URL", f"{stub.base_url}/api")
+    cache = HTTPCache(str(tmp_path))
+    session = cached_session(cache)
+
+    first, _ = title_info.fetch_phase(session, "Texts", "Genesis", metadata_only=False)
+    assert len(cache_files(cache)) == 1
+    second, _ = title_info.fetch_phase(session, "Texts", "Genesis", metadata_only=False)
+
+    assert second == first and first["versions"]
+    assert stub.stats["served"] == 1 and stub.stats["not_modified"] == 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_entry_evicted_during_revalidation(stub, tmp_path, monkeypatch, stream):
+    cache = HTTPCache(str(tmp_path))
+    session = cached_session(cache)
+    url = f"{stub.base_url}/api/v2/raw/index/Genesis"
+    expected = session.get(url).content
+
+    lookup = cache.lookup
+
+    def lookup_then_evict(lookup_url):
+        # The entry is found, then removed (as by another worker's eviction) before the 304 arrives
+        meta = lookup(lookup_url)
+        if meta is not None:
+            os.remove(cache.path_for(lookup_url))
+        return meta
+
+    monkeypatch.setattr(cache, "lookup", lookup_then_evict)
+    response = session.get(url, stream=stream)
+
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.content == expected
+    assert stub.stats["not_modified"] == 1 and stub.stats["served"] == 2
+    assert len(cache_files(cache)) == 1
+
+
+def test_async_entry_evicted_during_revalidation(stub, tmp_path, monkeypatch):
+    async_client = pytest.importorskip("async_client")
+    pytest.importorskip("aiohttp")
+    cache = HTTPCache(str(tmp_path))
+    url = f"{stub.base_url}/api/v2/raw/index/Genesis"
+    expected = cached_session(cache).get(url).content
+
+    lookup = cache.lookup
+
+    def lookup_then_evict(lookup_url):
+        meta = lookup(lookup_url)
+        if meta is not None:
+            os.remove(cache.path_for(lookup_url))
+        return meta
+
+    monkeypatch.setattr(cache, "lookup", lookup_then_evict)
+    assert async_client.fetch_json_many([url], cache=cache) == [json.loads(expected)]
+    assert stub.stats["not_modified"] == 1 and stub.stats["served"] == 2
+    assert len(cache_files(cache)) == 1
@@ -0,0 +1,43 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_stream
+from json_stream import basic_parse, build_value
+
+MALFORMED = [b"]", b"}", b'{"a" 1}', b"[1,]", b"[1 2]", b'{"a": 1,}', b"[,1]", b'{"a"}', b"{1: 2}", b"1 2", b"", b"[1]]", b"[}", b'{"a": 1 "b": 2}']
+WELL_FORMED = [b"{}", b"[]", b" 5 ", b'"s"', b'{"a": {"b": [1, 2.5, -3e2, true, false, null, "x"]}, "c": [{}, []]}']
+
+
+@pytest.fixture(params=["ijson", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(json_stream, "ijson", None)
+    elif json_stream.ijson is None:
+        pytest.skip("ijson is not installed")
+    return request.param
+
+
+def parse(body, buf_size=64 * 1024):
+    events = iter(basic_parse(io.BytesIO(body), buf_size))
+    value = build_value(*next(events), events)
+    for _ in events:
+        pass
+    return value
+
+
+@pytest.mark.parametrize("body", MALFORMED)
+def test_malformed_raises_value_error(backend, body):
+    with pytest.raises(ValueError):
+        parse(body)
+
+
+@pytest.mark.parametrize("body", WELL_FORMED)
+@pytest.mark.parametrize("buf_size", [1, 7, 64 * 1024])
+def test_well_formed_matches_json(backend, body, buf_size):
+    assert parse(body, buf_size) == json.loads(body)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import title_info
+from sefaria_stub import SefariaStub
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with SefariaStub() as stub:
+        monkeypatch.setattr(title_info, "SEFARIA_API_URL", f"{stub.base_url}/api")
+        yield stub
+
+
+@pytest.mark.parametrize("title", ["Genesis", "Exodus", "Berakhot"])
+def test_versions_phase_matches_full_texts(stub, title):
+    session = requests.Session()
+    versions_data, _ = title_info.fetch_phase(session, "Texts", title, metadata_only=True)
+    texts_data, _ = title_info.fetch_phase(session, "Texts", title, metadata_only=False)
+
+    assert versions_data["versions"]
+    assert title_info.extract_hebrew_data({}, versions_data, {}, title) == title_info.extract_hebrew_data({}, texts_data, {}, title)
+
+
+def test_primary_versions():
+    versions = [
+        {"versionTitle": "a", "priority": 1},
+        {"versionTitle": "b", "priority": 3},
+        {"versionTitle": "c", "priority": 3},
+    ]
+    assert title_info.primary_versions(versions) == [versions[1]]
+    assert title_info.primary_versions(versions + [{"versionTitle": "d", "isPrimary": True}]) == [{"versionTitle": "d", "isPrimary": True}]
+    assert title_info.primary_versions([]) == []
+
+
+def test_batch_title_without_api_data_fails(stub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(title_info, "build_shadow_trees_for_titles", lambda index_file, titles, *args: {title: {} for title in titles})
+    summary = title_info.run_batch(["Genesis", "Nonexistent"], None, workers=2, summary_file=str(tmp_path / "summary.json"), use_cache=False)
+
+    assert summary["titles"]["Genesis"]["status"] == "ok"
+    assert summary["titles"]["Nonexistent"]["status"] == "error"
+    assert summary["failed"] == ["Nonexistent"] and summary["partial"] == []
+    assert sorted(os.listdir(tmp_path)) == ["Genesis_hebrew_info.json", "summary.json"]
@@ -1,112 +1,256 @@
+import argparse
+import asyncio
+import io
 import json
+import os
 import sys
 import time
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from async_client import AsyncFetchError, AsyncSefariaClient
+from commentary_index import load_commentary_index
+from http_cache import create_session, get_http_cache
+from json_stream import ChunkReader, basic_parse, build_value, skip_value
+from profiling import PhaseProfiler, phase
+from sefaria_toc import SEFARIA_API_URL
+from shadow_trie import ShadowTreeTrie
 
-def create_session():
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    return session
+def title_print(title, message):
+    """Print message prefixed with title, as one write so lines from concurrent batch workers never run together."""
+    sys.stdout.write(f"{title}: {message}\n" if title else f"{message}\n")
 
-def fetch_sefaria_data(title):
-    print(f"Starting to fetch data for {title}...")
+def _fetch_json_phase(session, url, label, describe, parse_stream=None, title=None):
+    """GET url as JSON; with parse_stream, the body is streamed into parse_stream(f) instead of response.json()."""
+    start_time = time.perf_counter()
+    try:
+        with session.get(url, headers={"accept": "application/json"}, timeout=10, stream=parse_stream is not None) as response:
+            response.raise_for_status()
+            if parse_stream is None:
+                data = response.json()
+            else:
+                reader = ChunkReader(response.iter_content(64 * 1024))
+                data = parse_stream(reader)
+                # parse_stream may stop at the end of the document; the HTTP cache only stores bodies read to EOF
+                while reader.read(64 * 1024):
+                    pass
+        title_print(title, f"{label} data: {describe(data)}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        title_print(title, f"Warning: Failed to fetch {label.lower()} data: {e}")
+        data = {}
+    return data, time.perf_counter() - start_time
+
+# The version fields extract_hebrew_data reads; the rest of each version, notably its text, is skipped
+VERSION_FIELDS = ("versionTitle", "language", "versionSource", "status")
+
+def stream_texts_versions(f):
+    """
+    Decode a v3 texts response from binary file f incrementally into {"versions": [...]}, keeping only
+    VERSION_FIELDS of each version. Text arrays and all other keys are skipped event by event, so
+    they are never built as Python lists.
+    """
+    events = iter(basic_parse(f))
+    event, value = next(events, (None, None))
+    if event is None:
+        raise ValueError("Empty JSON document")
+    if event != "start_map":
+        return build_value(event, value, events)
+    result = {"versions": []}
+    for event, key in events:
+        if event == "end_map":
+            break
+        event, value = next(events)
+        if key != "versions" or event != "start_array":
+            skip_value(event, events)
+            continue
+        for event, value in events:
+            if event == "end_array":
+                break
+            if event != "start_map":
+                skip_value(event, events)
+                continue
+            version = {}
+            for event, field in events:
+                if event == "end_map":
+                    break
+                event, value = next(events)
+                if field in VERSION_FIELDS:
+                    version[field] = build_value(event, value, events)
+                else:
+                    skip_value(event, events)
+            result["versions"].append(version)
+    return result
+
+# Fetch phases: label -> (endpoint template, summary printed on success)
+FETCH_PHASES = {
+    "Index": (
+        "v2/raw/index/{title}",
+        lambda data: f"{len(data.get('schema', {}).get('sectionNames', []))} sections found",
+    ),
+    "Texts": (
+        "v3/texts/{title}",
+        lambda data: f"{len(data.get('versions', []))} versions found",
+    ),
+}
+
+# Metadata-only replacement for the Texts phase: extract_hebrew_data only reads version metadata, and
+# this endpoint returns the version list without any text bodies
+VERSIONS_ENDPOINT = "texts/versions/{title}"
+
+def primary_versions(versions):
+    """
+    The versions endpoint lists every version of a book, while v3/texts/{title} returns only the primary
+    one by default. Keep that one so both modes produce the same output: the version flagged isPrimary,
+    else the one with the highest priority (the first on ties).
+    """
+    if not versions:
+        return []
+    primary = [version for version in versions if version.get("isPrimary")]
+    if primary:
+        return primary[:1]
+    return [max(versions, key=lambda version: version.get("priority") or 0)]
+
+def phase_url(label, title):
+    return f"{SEFARIA_API_URL}/{FETCH_PHASES[label][0].format(title=title)}"
+
+def versions_url(title):
+    return f"{SEFARIA_API_URL}/{VERSIONS_ENDPOINT.format(title=title)}"
+
+def _fetch_versions_phase(session, title):
+    """Texts phase in metadata-only mode: {"versions": [...]} from the versions endpoint, else the full texts call."""
+    data, elapsed = _fetch_json_phase(session, versions_url(title), "Versions", lambda data: f"{len(data)} versions found", title=title)
+    if isinstance(data, list):
+        return {"versions": primary_versions(data)}, elapsed
+    title_print(title, "Versions endpoint unavailable, falling back to full texts data...")
+    data, fallback_elapsed = _fetch_texts_phase(session, title)
+    return data, elapsed + fallback_elapsed
+
+def _fetch_texts_phase(session, title):
+    return _fetch_json_phase(session, phase_url("Texts", title), "Texts", FETCH_PHASES["Texts"][1], stream_texts_versions, title)
+
+def fetch_phase(session, label, title, metadata_only=True, profiler=None):
+    with phase(profiler, f"fetch_{label.lower()}", title):
+        if label == "Texts":
+            return _fetch_versions_phase(session, title) if metadata_only else _fetch_texts_phase(session, title)
+        return _fetch_json_phase(session, phase_url(label, title), label, FETCH_PHASES[label][1], title=title)
+
+def fetch_sefaria_data(title, session=None, metadata_only=True, profiler=None):
+    title_print(title, "Starting to fetch data...")
     progress = 0
-    session = create_session()
+    if session is None:
+        session = create_session()
+    start_time = time.perf_counter()
 
-    # Fetch index data
-    print("Phase 1/2: Fetching index data...")
-    start_time = time.time()
-    index_url = f"https://www.sefaria.org/api/v2/raw/index/{title}"
-    try:
-        index_response = session.get(index_url, headers={"accept": "application/json"}, timeout=10)
-        index_response.raise_for_status()
-        index_data = index_response.json()
-        print(f"Index data: {len(index_data.get('schema', {}).get('sectionNames', []))} sections found")
-    except requests.exceptions.RequestException as e:
-        print(f"Warning: Failed to fetch index data: {e}")
-        index_data = {}
-    progress += 50
-    print(f"Progress: {progress}% - Index data fetched in {time.time() - start_time:.2f} seconds.")
-
-    # Fetch texts data (versions)
-    print("Phase 2/2: Fetching texts data...")
-    start_time = time.time()
-    texts_url = f"https://www.sefaria.org/api/v3/texts/{title}"
-    try:
-        texts_response = session.get(texts_url, headers={"accept": "application/json"}, timeout=10)
-        texts_response.raise_for_status()
-        texts_data = texts_response.json()
-        print(f"Texts data: {len(texts_data.get('versions', []))} versions found")
-    except requests.exceptions.RequestException as e:
-        print(f"Warning: Failed to fetch texts data: {e}")
-        texts_data = {}
-    progress += 50
-    print(f"Progress: {progress}% - Texts data fetched in {time.time() - start_time:.2f} seconds.")
-
-    return index_data, texts_data
-
-def build_shadow_trees(index_file, target_title):
+    # Fetch index data and texts data (versions) concurrently
+    title_print(title, "Phases 1-2/2: Fetching index and texts data concurrently...")
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(FETCH_PHASES)) as executor:
+        futures = {
+            executor.submit(fetch_phase, session, label, title, metadata_only, profiler): label
+            for label in FETCH_PHASES
+        }
+        for future in as_completed(futures):
+            label = futures[future]
+            data, elapsed = future.result()
+            results[label] = data
+            progress += 50
+            title_print(title, f"Progress: {progress}% - {label} data fetched in {elapsed:.2f} seconds.")
+    title_print(title, f"Fetched index and texts data in {time.perf_counter() - start_time:.2f} seconds.")
+
+    return results["Index"], results["Texts"]
+
+def fetch_sefaria_data_async(titles, limit_per_host=8, use_cache=True, metadata_only=True, profiler=None):
+    """
+    Fetch index and texts data for many titles over one asyncio connection pool.
+    Returns {title: (index_data, texts_data, seconds)} with the same {} fallback per failed phase.
+    """
+    title_print(None, f"Fetching index and texts data for {len(titles)} titles (async, {limit_per_host} connections per host)...")
+    start_time = time.perf_counter()
+    cache = get_http_cache() if use_cache and os.environ.get("SEFARIA_CACHE", "1") != "0" else None
+
+    async def fetch_phase(client, title, label):
+        phase_start = time.perf_counter()
+        if label == "Texts" and metadata_only:
+            try:
+                versions = await client.get_json(versions_url(title))
+            except AsyncFetchError as e:
+                title_print(title, f"Warning: Failed to fetch versions data: {e}")
+                versions = None
+            if isinstance(versions, list):
+                title_print(title, f"Versions data: {len(versions)} versions found")
+                return {"versions": primary_versions(versions)}, time.perf_counter() - phase_start
+            title_print(title, "Versions endpoint unavailable, falling back to full texts data...")
+        try:
+            if label == "Texts":
+                # The body is already in memory here, but decoding it incrementally still skips the text arrays
+                data = stream_texts_versions(io.BytesIO(await client.get_bytes(phase_url(label, title))))
+            else:
+                data = await client.get_json(phase_url(label, title))
+            title_print(title, f"{label} data: {FETCH_PHASES[label][1](data)}")
+        except (AsyncFetchError, ValueError) as e:
+            title_print(title, f"Warning: Failed to fetch {label.lower()} data: {e}")
+            data = {}
+        return data, time.perf_counter() - phase_start
+
+    async def fetch_all():
+        async with AsyncSefariaClient(limit_per_host=limit_per_host, cache=cache) as client:
+            phase_results = await asyncio.gather(*(
+                fetch_phase(client, title, label) for title in titles for label in FETCH_PHASES
+            ))
+        results = {}
+        for i, title in enumerate(titles):
+            (index_data, index_seconds), (texts_data, texts_seconds) = phase_results[2 * i:2 * i + 2]
+            if profiler is not None:
+                profiler.record("fetch_index", title, index_seconds)
+                profiler.record("fetch_texts", title, texts_seconds)
+            results[title] = (index_data, texts_data, max(index_seconds, texts_seconds))
+        return results
+
+    results = asyncio.run(fetch_all())
+    title_print(None, f"Fetched data for {len(titles)} titles in {time.perf_counter() - start_time:.2f} seconds.")
+    return results
+
+def build_shadow_trees(index_file, target_title, use_cache=True, streaming=False):
     print(f"Building shadow trees for {target_title}...")
-    start_time = time.time()
-    shadow_trees = {}
-    
-    with open(index_file, "r", encoding="utf-8") as f:
-        index_data = json.load(f)
-    
-    def search_contents(contents, current_path, target_title):
-        for item in contents:
-            categories = item.get("categories", [])
-            dependence = item.get("dependence", "")
-            base_text_titles = item.get("base_text_titles", [])
-            he_title = item.get("heTitle", "")
-            en_title = item.get("title", "")
-            en_short_desc = item.get("enShortDesc", "").lower()
-            
-            # Skip modern commentaries
-            if any(keyword in en_short_desc for keyword in ["modern", "contemporary", "21st-century", "20th-century"]):
-                continue
-            
-            # Check if relevant to target_title
-            is_specific = target_title in base_text_titles and len(base_text_titles) == 1
-            is_category_specific = any(f"{target_title}" in cat for cat in categories)
-            
-            if ("Commentary" in categories or dependence == "Commentary" or "Targum" in categories) and (is_specific or is_category_specific):
-                commentator_name = he_title or en_title
-                if not commentator_name:
-                    continue
-                
-                # Initialize commentator's tree
-                if commentator_name not in shadow_trees:
-                    shadow_trees[commentator_name] = {}
-                
-                # Build path for the current item
-                item_path = current_path + [en_title or he_title]
-                path_key = ".".join(item_path)
-                
-                # Add to shadow tree
-                current_node = shadow_trees[commentator_name]
-                for segment in item_path:
-                    if segment not in current_node:
-                        current_node[segment] = {}
-                    current_node = current_node[segment]
-                
-                current_node["title"] = en_title or he_title
-                current_node["path"] = item_path
-                current_node["type"] = "Targum" if "Targum" in categories else "Commentary"
-            
-            # Recursively search nested contents
-            if "contents" in item:
-                search_contents(item["contents"], current_path + [en_title or he_title], target_title)
-    
-    search_contents(index_data, [], target_title)
-    print(f"Built shadow trees with {len(shadow_trees)} commentators/targums in {time.time() - start_time:.2f} seconds")
+    start_time = time.perf_counter()
+    shadow_trees = build_commentary_index(index_file, use_cache, streaming).shadow_trees_for(target_title)
+    print(f"Built shadow trees with {len(shadow_trees)} commentators/targums in {time.perf_counter() - start_time:.2f} seconds")
     return shadow_trees
 
-def search_shadow_trees(shadow_trees, search_path):
+def build_commentary_index(index_file, use_cache=True, streaming=False):
+    start_time = time.perf_counter()
+    commentary_index, source = load_commentary_index(index_file, use_cache, streaming=streaming)
+    print(f"Commentary index {'loaded from cache' if source == 'cache' else 'built'} ({len(commentary_index.entries)} nodes) in {time.perf_counter() - start_time:.2f} seconds")
+    return commentary_index
+
+def build_shadow_trees_for_titles(index_file, target_titles=None, use_cache=True, streaming=False):
+    return build_shadow_trees_from_index(build_commentary_index(index_file, use_cache, streaming), target_titles)
+
+def build_shadow_trees_from_index(commentary_index, target_titles=None):
+    """
+    Build shadow trees for many titles from one pass over the TOC.
+    Returns {title: shadow_trees}, identical to calling build_shadow_trees once per title.
+    With target_titles=None, builds them for every base text referenced in the TOC.
+    """
+    start_time = time.perf_counter()
+    if target_titles is None:
+        target_titles = commentary_index.base_text_titles()
+    targets = list(dict.fromkeys(target_titles))
+    print(f"Building shadow trees for {len(targets)} titles...")
+    all_shadow_trees = {title: commentary_index.shadow_trees_for(title) for title in targets}
+    print(f"Built shadow trees for {len(targets)} titles from {len(commentary_index.entries)} commentary nodes in {time.perf_counter() - start_time:.2f} seconds")
+    return all_shadow_trees
+
+def search_shadow_trees(shadow_trees, search_path, commentary_index=None, title=None):
     print(f"Searching shadow trees for path: {search_path}...")
+    if commentary_index is not None and title is not None:
+        # Answer from the inverted index without walking every commentator's tree
+        results = commentary_index.search(title, search_path)
+        print(f"Found {len(results)} matches for path {search_path}")
+        return results
+    if isinstance(shadow_trees, ShadowTreeTrie):
+        results = shadow_trees.search(search_path)
+        print(f"Found {len(results)} matches for path {search_path}")
+        return results
     results = []
     path_key = ".".join(search_path)
     
@@ -130,8 +274,19 @@ def search_shadow_trees(shadow_trees, search_path):
     print(f"Found {len(results)} matches for path {search_path}")
     return results
 
+def search_shadow_trees_many(shadow_trees, search_paths, prefix=False):
+    """
+    Resolve many paths (or path prefixes, e.g. ["Tanakh", "Torah"] for everything under it) in one call.
+    Accepts shadow trees or a prebuilt ShadowTreeTrie; returns one result list per path.
+    """
+    print(f"Searching shadow trees for {len(search_paths)} {'prefixes' if prefix else 'paths'}...")
+    trie = shadow_trees if isinstance(shadow_trees, ShadowTreeTrie) else ShadowTreeTrie.from_shadow_trees(shadow_trees)
+    results = trie.search_many(search_paths, prefix)
+    print(f"Found {sum(len(path_results) for path_results in results)} matches")
+    return results
+
 def extract_hebrew_data(index_data, texts_data, shadow_trees, title):
-    print("Processing data...")
+    title_print(title, "Processing data...")
     result = {
         "חלוקות": {
             "פרקים_ופסוקים": {},
@@ -143,7 +298,7 @@ def extract_hebrew_data(index_data, texts_data, shadow_trees, title):
     progress = 0
 
     # Extract divisions
-    print("Phase 1/3: Extracting divisions...")
+    title_print(title, "Phase 1/3: Extracting divisions...")
     if index_data.get("schema"):
         schema = index_data["schema"]
         result["חלוקות"]["פרקים_ופסוקים"] = {
@@ -151,12 +306,12 @@ def extract_hebrew_data(index_data, texts_data, shadow_trees, title):
             "עומקים": schema.get("lengths", []),
             "כותרות_חלופיות": schema.get("heSectionNames", ["פרק", "פסוק"])
         }
-    print(f"Extracted divisions for {len(result['חלוקות']['פרקים_ופסוקים'].get('עומקים', []))} levels")
+    title_print(title, f"Extracted divisions for {len(result['חלוקות']['פרקים_ופסוקים'].get('עומקים', []))} levels")
     progress += 33
-    print(f"Progress: {progress}% - Divisions extracted.")
+    title_print(title, f"Progress: {progress}% - Divisions extracted.")
 
     # Extract Hebrew versions
-    print("Phase 2/3: Extracting Hebrew versions...")
+    title_print(title, "Phase 2/3: Extracting Hebrew versions...")
     hebrew_version_titles = [
         "מקרא על פי המסורה", "תנ\"ך עם ניקוד", "תנ\"ך ללא טעמים", "מקרא מבואר"
     ]
@@ -171,48 +326,177 @@ def extract_hebrew_data(index_data, texts_data, shadow_trees, title):
                     "סטטוס": version.get("status", "")
                 })
                 seen_versions.add(version_title)
-    print(f"Extracted {len(result['גרסאות'])} Hebrew versions")
+    title_print(title, f"Extracted {len(result['גרסאות'])} Hebrew versions")
     progress += 33
-    print(f"Progress: {progress}% - Hebrew versions extracted.")
+    title_print(title, f"Progress: {progress}% - Hebrew versions extracted.")
 
     # Add shadow trees
-    print("Phase 3/3: Adding shadow trees...")
+    title_print(title, "Phase 3/3: Adding shadow trees...")
     progress += 34
-    print(f"Progress: {progress}% - Shadow trees added.")
+    title_print(title, f"Progress: {progress}% - Shadow trees added.")
 
     return result
 
+def save_hebrew_data(hebrew_data, title):
+    title_print(title, "Saving data to JSON file...")
+    output_file = f"{title}_hebrew_info.json"
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(hebrew_data, f, ensure_ascii=False, indent=4)
+    title_print(title, f"Data saved to {output_file}")
+    return output_file
+
+def process_title(title, shadow_trees, session, fetched=None, metadata_only=True, profiler=None):
+    if fetched is None:
+        index_api_data, texts_data = fetch_sefaria_data(title, session, metadata_only, profiler)
+    else:
+        index_api_data, texts_data = fetched
+    if not index_api_data and not texts_data:
+        # Nothing came back from the API; an output file of empty divisions and versions would look like a success
+        raise RuntimeError("No index or texts data could be fetched")
+    with phase(profiler, "extract", title):
+        hebrew_data = extract_hebrew_data(index_api_data, texts_data, shadow_trees, title)
+    with phase(profiler, "serialize", title):
+        output_file = save_hebrew_data(hebrew_data, title)
+    return {
+        "output_file": output_file,
+        "index_fetched": bool(index_api_data),
+        "texts_fetched": bool(texts_data),
+    }
+
+def titles_from_selection(selection_file):
+    with open(selection_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    titles = []
+    for entry in data.get("reading_list", []):
+        en_title = entry.get("en_title")
+        if en_title and en_title not in titles:
+            titles.append(en_title)
+    return titles
+
+def run_batch(titles, index_file, workers=4, summary_file="batch_summary.json", use_cache=True, streaming=False, backend="threads", metadata_only=True, profiler=None):
+    title_print(None, f"Starting batch run for {len(titles)} titles with {workers} workers ({backend} backend)...")
+    start_time = time.perf_counter()
+    with phase(profiler, "build_shadow_trees"):
+        all_shadow_trees = build_shadow_trees_for_titles(index_file, titles, use_cache, streaming)
+    session = None
+    prefetched = {}
+    if backend == "async":
+        prefetched = fetch_sefaria_data_async(titles, limit_per_host=workers, use_cache=use_cache, metadata_only=metadata_only, profiler=profiler)
+    else:
+        session = create_session(pool_maxsize=max(10, workers * 2), use_cache=use_cache)
+    summary = {"titles": {}, "failed": [], "partial": []}
+
+    def run_one(title):
+        title_start = time.perf_counter()
+        fetched, fetch_seconds = None, 0
+        if title in prefetched:
+            index_api_data, texts_data, fetch_seconds = prefetched[title]
+            fetched = (index_api_data, texts_data)
+        try:
+            result = process_title(title, all_shadow_trees[title], session, fetched, metadata_only, profiler)
+            result["status"] = "ok" if result["index_fetched"] and result["texts_fetched"] else "partial"
+            result["seconds"] = round(time.perf_counter() - title_start + fetch_seconds, 3)
+            return result
+        except Exception as e:
+            return {"status": "error", "error": str(e), "seconds": round(time.perf_counter() - title_start, 3)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_one, title): title for title in titles}
+        for future in as_completed(futures):
+            title = futures[future]
+            summary["titles"][title] = future.result()
+            if summary["titles"][title]["status"] == "error":
+                summary["failed"].append(title)
+            elif summary["titles"][title]["status"] == "partial":
+                summary["partial"].append(title)
+            title_print(None, f"Batch progress: {len(summary['titles'])}/{len(titles)} titles done ({title}: {summary['titles'][title]['status']})")
+
+    summary["titles"] = {title: summary["titles"][title] for title in titles}
+    summary["total_seconds"] = round(time.perf_counter() - start_time, 3)
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+    title_print(None, f"Batch finished: {len(titles) - len(summary['failed'])} succeeded ({len(summary['partial'])} with missing API data), {len(summary['failed'])} failed in {summary['total_seconds']:.2f} seconds")
+    for title in summary["partial"]:
+        title_print(None, f"  Partial: {title}: index_fetched={summary['titles'][title]['index_fetched']}, texts_fetched={summary['titles'][title]['texts_fetched']}")
+    for title in summary["failed"]:
+        title_print(None, f"  Failed: {title}: {summary['titles'][title]['error']}")
+    title_print(None, f"Batch summary saved to {summary_file}")
+    return summary
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Build Hebrew info JSON files for Sefaria titles.",
+        usage="python title_info.py <title> <index_file> (e.g., Genesis download.json)\n"
+              "       python title_info.py <index_file> --titles Genesis Exodus [--workers 4]\n"
+              "       python title_info.py <index_file> --selection book_selection.json [--workers 4]",
+    )
+    parser.add_argument("title", nargs="?", help="single title to process")
+    parser.add_argument("index_file", help="Sefaria TOC JSON file (e.g., download.json)")
+    parser.add_argument("--titles", nargs="+", default=[], help="batch mode: titles to process")
+    parser.add_argument("--selection", help="batch mode: take titles from a book_selection.json reading_list")
+    parser.add_argument("--workers", type=int, default=4, help="batch mode: number of titles processed concurrently (connections per host with --backend async)")
+    parser.add_argument("--backend", choices=["threads", "async"], default="threads", help="batch mode: HTTP backend (async requires aiohttp)")
+    parser.add_argument("--summary", default="batch_summary.json", help="batch mode: summary output file")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk HTTP response and commentary index caches")
+    parser.add_argument("--full-texts", action="store_true", help="fetch the full v3 texts payload instead of only the versions list")
+    parser.add_argument("--stream-toc", action="store_true", help="parse the index file incrementally to cap peak memory")
+    parser.add_argument("--profile", nargs="?", const="profile_report.json", metavar="REPORT", help="write per-phase timings (aggregated across titles in batch mode) to REPORT (default: profile_report.json)")
+    parser.add_argument("--profile-cpu", action="store_true", help="with --profile: also record cProfile stats per phase (REPORT_<phase>.pstats)")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile: also record the tracemalloc peak of each phase (slows the run)")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if not args.title and not args.titles and not args.selection:
+        parser.error("a title, --titles or --selection is required")
+    if (args.profile_cpu or args.profile_memory) and not args.profile:
+        parser.error("--profile-cpu and --profile-memory require --profile")
+    return args
+
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python script.py <title> <index_file> (e.g., Genesis download.json)")
-        sys.exit(1)
-    
-    start_time = time.time()
+    args = parse_args(sys.argv[1:])
+    profiler = PhaseProfiler(cpu=args.profile_cpu, memory=args.profile_memory) if args.profile else None
+
+    if args.titles or args.selection:
+        titles = [args.title] if args.title else []
+        titles += [title for title in args.titles if title not in titles]
+        if args.selection:
+            titles += [title for title in titles_from_selection(args.selection) if title not in titles]
+        try:
+            run_batch(titles, args.index_file, args.workers, args.summary, use_cache=not args.no_cache, streaming=args.stream_toc, backend=args.backend, metadata_only=not args.full_texts, profiler=profiler)
+        finally:
+            if profiler is not None:
+                profiler.write(args.profile)
+        return
+
+    start_time = time.perf_counter()
     print("Starting script execution...")
     
-    title = sys.argv[1]
-    index_file = sys.argv[2]
+    title = args.title
+    index_file = args.index_file
     try:
-        index_data, texts_data = fetch_sefaria_data(title)
-        shadow_trees = build_shadow_trees(index_file, title)
-        hebrew_data = extract_hebrew_data(index_data, texts_data, shadow_trees, title)
+        index_data, texts_data = fetch_sefaria_data(title, create_session(use_cache=not args.no_cache), metadata_only=not args.full_texts, profiler=profiler)
+        with phase(profiler, "build_shadow_trees", title):
+            shadow_trees = build_shadow_trees(index_file, title, use_cache=not args.no_cache, streaming=args.stream_toc)
+        with phase(profiler, "extract", title):
+            hebrew_data = extract_hebrew_data(index_data, texts_data, shadow_trees, title)
         
         # Example search
         example_search_path = ["Tanakh", "Torah", title]
-        search_results = search_shadow_trees(shadow_trees, example_search_path)
+        with phase(profiler, "search_shadow_trees", title):
+            search_results = search_shadow_trees(shadow_trees, example_search_path)
         print("Example search results:", json.dumps(search_results, ensure_ascii=False, indent=4))
         
-        print("Saving data to JSON file...")
-        output_file = f"{title}_hebrew_info.json"
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(hebrew_data, f, ensure_ascii=False, indent=4)
+        with phase(profiler, "serialize", title):
+            save_hebrew_data(hebrew_data, title)
         
-        execution_time = time.time() - start_time
-        print(f"Data saved to {output_file}")
+        execution_time = time.perf_counter() - start_time
         print(f"Execution time: {execution_time:.2f} seconds")
         
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        if profiler is not None:
+            profiler.write(args.profile)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()